@@ -0,0 +1,59 @@
+import contextvars
+import functools
+import itertools
+import time
+
+from asgiref.sync import sync_to_async
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db_threads import run_in_db_thread
+
+from .signals import check_connections
+
+STREAM_BATCH_SIZE = 100
+
+
+def take_batch(iterator):
+    return list(itertools.islice(iterator, STREAM_BATCH_SIZE))
+
+
+async def iter_in_db_thread(content, context):
+    # Тело потокового ответа читает базу, поэтому части собираются пачками
+    # в общем пуле потоков ASYNC_DB_THREADS, а в цикл событий уходят готовые.
+    iterator = iter(content)
+    while True:
+        batch = await run_in_db_thread(context.run, take_batch, iterator)
+        if not batch:
+            return
+        yield b''.join(batch)
+
+
+def call_view(view, request, *args, **kwargs):
+    check_connections(sender=call_view)
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and not response.is_rendered:
+        request.render_started = time.perf_counter()
+        response.render()
+        request.render_finished = time.perf_counter()
+    elif response.streaming:
+        # Django 3.2 перебирает потоковый ответ прямо в цикле событий, где
+        # запросы к базе запрещены: тело отдаёт StreamingASGIHandler.
+        response.async_streaming_content = iter_in_db_thread(
+            response.streaming_content, contextvars.copy_context()
+        )
+        response.streaming_content = ()
+    return response
+
+
+def async_view(view):
+    sync_view = sync_to_async(view, thread_sensitive=True)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_view(request, *args, **kwargs)
+        return await run_in_db_thread(
+            call_view, view, request, *args, **kwargs
+        )
+
+    return wrapper
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram.db_router import read_from_primary
+from users.models import User
+
+TOKEN_CACHE_KEY = 'auth:user:{}'
+# В кэше только то, что нужно на каждый запрос; остальные поля пользователя
+# (в том числе пароль) отложены и загружаются из базы при обращении.
+CACHED_USER_FIELDS = ('id', 'is_active', 'is_superuser', 'feed_inbox')
+USER_CACHE_FIELDS = [
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in CACHED_USER_FIELDS
+]
+
+
+class TokenCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def get_token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_token(key):
+    cache_key = get_token_cache_key(key)
+    token_cache.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def invalidate_user_tokens(user_id):
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    for key in keys:
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def get_user_values(self, key):
+        with read_from_primary():
+            return (
+                self.get_model()
+                .objects.filter(key=key)
+                .values_list(*(f'user__{name}' for name in USER_CACHE_FIELDS))
+                .first()
+            )
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        entry = token_cache.get(cache_key)
+        if entry is None:
+            entry = cache.get(cache_key)
+            if entry is None or entry[1] <= time.time():
+                values = self.get_user_values(key)
+                if values is None:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+                entry = (values, time.time() + timeout)
+                cache.set(cache_key, entry, timeout)
+            token_cache.set(cache_key, entry)
+        user = User.from_db(DEFAULT_DB_ALIAS, USER_CACHE_FIELDS, entry[0])
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        token = self.get_model().from_db(
+            DEFAULT_DB_ALIAS, ['key', 'user_id'], [key, user.pk]
+        )
+        token.user = user
+        return user, token
@@ -0,0 +1,64 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from recipes.models import Ingredient
+
+from .cache import get_reference_version
+
+SEPARATOR = '\n'
+
+
+class IngredientIndex:
+    def __init__(self):
+        self.version = None
+        self.data = ([], [], '', [])
+        self.lock = threading.Lock()
+
+    def build(self):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].lower(), row['id']),
+        )
+        keys = [row['name'].lower().replace(SEPARATOR, ' ') for row in rows]
+        offsets = []
+        position = 0
+        for key in keys:
+            offsets.append(position)
+            position += len(key) + len(SEPARATOR)
+        return keys, rows, SEPARATOR.join(keys), offsets
+
+    def refresh(self):
+        version = get_reference_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self.data = self.build()
+            self.version = version
+
+    def search(self, query, limit):
+        self.refresh()
+        keys, rows, text, offsets = self.data
+        query = query.lower()
+        result = []
+        index = bisect_left(keys, query)
+        while (
+            index < len(keys)
+            and len(result) < limit
+            and keys[index].startswith(query)
+        ):
+            result.append(rows[index])
+            index += 1
+        position = text.find(query)
+        while position != -1 and len(result) < limit:
+            index = bisect_right(offsets, position) - 1
+            if offsets[index] != position:
+                result.append(rows[index])
+            if index + 1 == len(offsets):
+                break
+            position = text.find(query, offsets[index + 1])
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,221 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+from foodgram.db_router import read_from_primary
+from recipes.models import Tag
+
+REFERENCE_VERSION_KEY = 'reference:{}:version'
+REFERENCE_DATA_KEY = 'reference:{}:{}:{}'
+REFERENCE_STATS_KEY = 'reference:{}:{}'
+REFERENCE_NAMES = ('tags', 'ingredients', 'recipes')
+RESPONSE_DATA_KEY = 'response:{}:{}'
+RESPONSE_LOCK_KEY = 'response:{}:{}:lock'
+RESPONSE_LOCK_TIMEOUT = 10
+
+
+def get_reference_version(name):
+    key = REFERENCE_VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_reference_cache(name):
+    cache.set(
+        REFERENCE_VERSION_KEY.format(name),
+        time.time_ns() // 1000000,
+        timeout=None,
+    )
+
+
+def invalidate_on_commit(name):
+    transaction.on_commit(lambda: invalidate_reference_cache(name))
+
+
+def count_reference_cache(name, result):
+    key = REFERENCE_STATS_KEY.format(name, result)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_reference_cache_stats():
+    stats = {}
+    for name in REFERENCE_NAMES:
+        hits = cache.get(REFERENCE_STATS_KEY.format(name, 'hit'), 0)
+        misses = cache.get(REFERENCE_STATS_KEY.format(name, 'miss'), 0)
+        total = hits + misses
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+        }
+        stale = cache.get(REFERENCE_STATS_KEY.format(name, 'stale'))
+        if stale is not None:
+            stats[name]['stale'] = stale
+    return stats
+
+
+def get_tag_slug_map():
+    key = REFERENCE_DATA_KEY.format(
+        'tags', get_reference_version('tags'), 'slugs'
+    )
+    slug_map = cache.get(key)
+    if slug_map is None:
+        with read_from_primary():
+            slug_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, slug_map, timeout=settings.REFERENCE_CACHE_TIMEOUT)
+    return slug_map
+
+
+class ReferenceCacheMixin:
+    reference_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_variant(self, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        variant = f'{self.action}:{self.kwargs.get("pk", "")}:{query}'
+        return hashlib.md5(variant.encode()).hexdigest()
+
+    def set_validators(self, response, version):
+        response['ETag'] = quote_etag(f'{self.reference_name}-{version}')
+        response['Last-Modified'] = http_date(version // 1000)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_not_modified(self, request, version):
+        response = get_conditional_response(
+            request,
+            etag=quote_etag(f'{self.reference_name}-{version}'),
+            last_modified=version // 1000,
+        )
+        if response is not None:
+            return self.set_validators(response, version)
+        return None
+
+    def cached_response(self, view, request, *args, **kwargs):
+        version = get_reference_version(self.reference_name)
+        # ETag общий для всего справочника, поэтому у retrieve заголовки
+        # проверяются только после того, как объект нашёлся: иначе на
+        # несуществующий pk вернулся бы 304 вместо 404.
+        if self.action == 'list':
+            not_modified = self.get_not_modified(request, version)
+            if not_modified is not None:
+                return not_modified
+        key = REFERENCE_DATA_KEY.format(
+            self.reference_name, version, self.get_variant(request)
+        )
+        data = cache.get(key)
+        if data is not None:
+            count_reference_cache(self.reference_name, 'hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+        else:
+            count_reference_cache(self.reference_name, 'miss')
+            with read_from_primary():
+                response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            data = list(data) if isinstance(data, list) else dict(data)
+            cache.set(key, data, timeout=settings.REFERENCE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+        not_modified = self.get_not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(response, version)
+
+
+class AnonymousResponseCacheMixin:
+    reference_name = None
+    cache_query_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.anonymous_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.anonymous_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cache_variant(self, request):
+        params = []
+        for name, values in sorted(request.query_params.lists()):
+            if name not in self.cache_query_params:
+                return None
+            params.append((name, sorted(set(values))))
+        variant = ':'.join(
+            (
+                request.build_absolute_uri('/'),
+                self.action,
+                str(self.kwargs.get('pk', '')),
+                urlencode(params, doseq=True),
+            )
+        )
+        return hashlib.md5(variant.encode()).hexdigest()
+
+    def cache_response(self, response, result):
+        count_reference_cache(self.reference_name, result.lower())
+        response['X-Cache'] = result
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def anonymous_cached_response(self, view, request, *args, **kwargs):
+        variant = self.get_cache_variant(request)
+        if (
+            variant is None
+            or request.user.is_authenticated
+            or not settings.RESPONSE_CACHE_TIMEOUT
+        ):
+            return view(request, *args, **kwargs)
+        version = get_reference_version(self.reference_name)
+        key = RESPONSE_DATA_KEY.format(self.reference_name, variant)
+        lock_key = RESPONSE_LOCK_KEY.format(self.reference_name, variant)
+        locked = False
+        cached = cache.get(key)
+        if cached is not None:
+            cached_version, data = cached
+            if cached_version == version:
+                return self.cache_response(Response(data), 'HIT')
+            if settings.RESPONSE_CACHE_STALE:
+                locked = cache.add(
+                    lock_key, version, timeout=RESPONSE_LOCK_TIMEOUT
+                )
+                if not locked:
+                    return self.cache_response(Response(data), 'STALE')
+        try:
+            with read_from_primary():
+                response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    (version, dict(response.data)),
+                    timeout=settings.RESPONSE_CACHE_TIMEOUT,
+                )
+        finally:
+            # Снимаем только свою блокировку: запрос без неё не должен
+            # отпускать чужое обновление.
+            if locked:
+                cache.delete(lock_key)
+        return self.cache_response(response, 'MISS')
@@ -0,0 +1,74 @@
+from django.db import transaction
+
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription, User
+
+from .authentication import invalidate_user_tokens
+
+FEED_BATCH_SIZE = 5000
+
+
+def add_feed_items(user_id, recipe_ids):
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in recipe_ids
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_recipe(recipe):
+    subscriber_ids = Subscription.objects.filter(
+        author_id=recipe.author_id, subscriber__feed_inbox=True
+    ).values_list('subscriber_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=subscriber_id, recipe_id=recipe.pk)
+            for subscriber_id in subscriber_ids
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author_to_feed(subscription):
+    if not subscription.subscriber.feed_inbox:
+        return
+    recipe_ids = Recipe.objects.filter(
+        author_id=subscription.author_id
+    ).values_list('pk', flat=True)
+    add_feed_items(subscription.subscriber_id, recipe_ids)
+
+
+def remove_authors_from_feed(user_id, author_ids):
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author__in=author_ids
+    ).delete()
+
+
+def remove_author_from_feed(subscription):
+    remove_authors_from_feed(
+        subscription.subscriber_id, [subscription.author_id]
+    )
+
+
+@transaction.atomic
+def enable_feed_inbox(user_id):
+    User.objects.filter(pk=user_id).update(feed_inbox=True)
+    authors = Subscription.objects.filter(subscriber_id=user_id).values(
+        'author'
+    )
+    recipe_ids = Recipe.objects.filter(author__in=authors).values_list(
+        'pk', flat=True
+    )
+    add_feed_items(user_id, recipe_ids)
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
+
+
+@transaction.atomic
+def disable_feed_inbox(user_id):
+    User.objects.filter(pk=user_id).update(feed_inbox=False)
+    FeedItem.objects.filter(user_id=user_id).delete()
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
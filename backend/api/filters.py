@@ -1,20 +1,32 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Lower
 from django_filters import rest_framework as filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Recipe, Tag
+from recipes.models import Favorite, Purchase, Recipe, RecipeTag
 
+from .cache import get_tag_slug_map
 
-class IngredientFilter(SearchFilter):
+
+class IngredientFilter(BaseFilterBackend):
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param)
+        if not name:
+            return queryset
+        return (
+            queryset.annotate(name_lower=Lower('name'))
+            .filter(name_lower__startswith=name.lower())
+            .order_by('name_lower')[: settings.INGREDIENT_SEARCH_LIMIT]
+        )
+
 
 class RecipeFilter(filters.FilterSet):
     author = filters.NumberFilter(field_name='author__id', lookup_expr='exact')
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
-    )
+    tags = filters.CharFilter(method='get_tags')
+    search = filters.CharFilter(method='get_search')
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
@@ -22,14 +34,49 @@ class RecipeFilter(filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'author',
+            'tags',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'search',
+        ]
 
-    def get_is_favorited(self, queryset, name, value):
+    def get_tags(self, queryset, name, value):
+        slug_map = get_tag_slug_map()
+        tag_ids = [
+            slug_map[slug]
+            for slug in self.data.getlist(name)
+            if slug in slug_map
+        ]
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                RecipeTag.objects.filter(
+                    recipe=OuterRef('pk'), tag__in=tag_ids
+                )
+            )
+        )
+
+    def get_search(self, queryset, name, value):
+        value = value.strip()
         if not value:
             return queryset
-        return queryset.filter(favorites__user=self.request.user)
+        return queryset.search(value)
 
-    def get_is_in_shopping_cart(self, queryset, name, value):
+    def filter_by_user(self, queryset, model, value):
         if not value:
             return queryset
-        return queryset.filter(purchases__user=self.request.user)
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(
+            Exists(model.objects.filter(user=user, recipes=OuterRef('pk')))
+        )
+
+    def get_is_favorited(self, queryset, name, value):
+        return self.filter_by_user(queryset, Favorite, value)
+
+    def get_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_by_user(queryset, Purchase, value)
@@ -0,0 +1,152 @@
+import threading
+from collections import Counter
+
+from api.management.commands.load_test import Client, Stats
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from recipes.generators import GENERATED_PASSWORD
+from recipes.models import (AmountRecipe, CartIngredient, Favorite, Purchase,
+                            Recipe)
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляем одновременные одинаковые запросы на добавление и '
+        'удаление избранного, списка покупок и подписок и проверяем, что '
+        'ровно один из них выполняется, а счётчики не расходятся.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--threads', default=20, type=int)
+        parser.add_argument('--rounds', default=5, type=int)
+        parser.add_argument(
+            '--seed',
+            default=0,
+            type=int,
+            help='--seed, с которым запускалась команда generate_data.',
+        )
+
+    def handle(self, *args, **options):
+        stats = Stats()
+        client = Client(options['url'], stats)
+        token = client.json(
+            'login',
+            'POST',
+            '/api/auth/token/login/',
+            {
+                'email': f'gen{options["seed"]}_0@example.com',
+                'password': GENERATED_PASSWORD,
+            },
+        )
+        if token is None:
+            raise CommandError('Не удалось авторизоваться.')
+        client.headers['Authorization'] = f'Token {token["auth_token"]}'
+        user = client.json('me', 'GET', '/api/users/me/')
+        recipes = client.json('recipes', 'GET', '/api/recipes/?limit=50')
+        recipe = next(
+            (
+                recipe
+                for recipe in recipes['results']
+                if recipe['author']['id'] != user['id']
+            ),
+            None,
+        )
+        if recipe is None:
+            raise CommandError('Не найден рецепт другого автора.')
+        author_id = recipe['author']['id']
+        clients = []
+        for _ in range(options['threads']):
+            clients.append(Client(options['url'], stats))
+            clients[-1].headers = dict(client.headers)
+        scenarios = (
+            ('favorite', f'/api/recipes/{recipe["id"]}/favorite/'),
+            ('shopping cart', f'/api/recipes/{recipe["id"]}/shopping_cart/'),
+            ('subscribe', f'/api/users/{author_id}/subscribe/'),
+        )
+        failures = []
+        for name, path in scenarios:
+            client.request(name, 'DELETE', path)
+            for _ in range(options['rounds']):
+                for method, done_status in (('POST', 201), ('DELETE', 204)):
+                    statuses = Counter(
+                        self.hammer(clients, name, method, path)
+                    )
+                    ok = (
+                        statuses[done_status] == 1
+                        and set(statuses) <= {done_status, 400}
+                    )
+                    if not ok:
+                        failures.append(f'{name} {method}')
+                    self.stdout.write(
+                        f'{"OK  " if ok else "FAIL"} {name} {method}: '
+                        + ', '.join(
+                            f'{status} x {count}'
+                            for status, count in sorted(statuses.items())
+                        )
+                    )
+        problems = self.check_counters(recipe['id'], author_id, user['id'])
+        for problem in problems:
+            self.stdout.write(f'FAIL {problem}')
+        failures += problems
+        if failures:
+            raise CommandError('Ошибки: ' + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Гонок не обнаружено!'))
+
+    def hammer(self, clients, name, method, path):
+        barrier = threading.Barrier(len(clients))
+        statuses = [0] * len(clients)
+
+        def run(index, client):
+            barrier.wait()
+            statuses[index] = client.request(name, method, path)[0]
+
+        workers = [
+            threading.Thread(target=run, args=(index, client))
+            for index, client in enumerate(clients)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return statuses
+
+    def check_counters(self, recipe_id, author_id, user_id):
+        recipe = Recipe.objects.get(pk=recipe_id)
+        author = User.objects.get(pk=author_id)
+        counters = (
+            (
+                'favorites_count',
+                recipe.favorites_count,
+                Favorite.objects.filter(recipes=recipe).count(),
+            ),
+            (
+                'in_carts_count',
+                recipe.in_carts_count,
+                Purchase.objects.filter(recipes=recipe).count(),
+            ),
+            (
+                'followers_count',
+                author.followers_count,
+                Subscription.objects.filter(author=author).count(),
+            ),
+        )
+        problems = [
+            f'{field}: {value} вместо {actual}'
+            for field, value, actual in counters
+            if value != actual
+        ]
+        cart = dict(
+            AmountRecipe.objects.filter(recipe__purchases__user=user_id)
+            .order_by()
+            .values_list('ingredient')
+            .annotate(amount=Sum('amount'))
+        )
+        if cart != dict(
+            CartIngredient.objects.filter(user=user_id).values_list(
+                'ingredient', 'amount'
+            )
+        ):
+            problems.append('список покупок')
+        return problems
@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from urllib.parse import quote
+
+from api.management.commands.load_test import (PERCENTILES, Client, Stats,
+                                               percentile)
+from django.core.management.base import BaseCommand, CommandError
+from recipes.generators import GENERATED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравниваем предел одновременных клиентов для WSGI и ASGI: на '
+        'каждом уровне нагрузки читаем список и страницы рецептов, ищем '
+        'ингредиенты и скачиваем список покупок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server',
+            action='append',
+            required=True,
+            help='Название и адрес сервера: wsgi=http://127.0.0.1:8000.',
+        )
+        parser.add_argument(
+            '--levels', default=[10, 50, 100, 200], nargs='+', type=int
+        )
+        parser.add_argument(
+            '--duration',
+            default=15,
+            type=int,
+            help='Секунды на каждый уровень.',
+        )
+        parser.add_argument(
+            '--max-p95',
+            default=1000,
+            type=int,
+            help='Допустимый p95 времени ответа, мс.',
+        )
+        parser.add_argument(
+            '--max-errors',
+            default=1.0,
+            type=float,
+            help='Допустимая доля ошибок, %%.',
+        )
+        parser.add_argument(
+            '--seed',
+            default=0,
+            type=int,
+            help='--seed, с которым запускалась команда generate_data.',
+        )
+        parser.add_argument(
+            '--accounts',
+            default=20,
+            type=int,
+            help='Сколько сгенерированных пользователей использовать.',
+        )
+        parser.add_argument(
+            '--pages',
+            default=10,
+            type=int,
+            help='Из скольких первых страниц выбирать список рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        limits = {}
+        for server in options['server']:
+            name, _, url = server.rpartition('=')
+            name = name or url
+            self.stdout.write(f'{name} ({url})')
+            tokens = self.login(url, options)
+            limits[name] = None
+            for level in options['levels']:
+                ok = self.run_level(url, tokens, level, options)
+                if not ok:
+                    break
+                limits[name] = level
+        for name, limit in limits.items():
+            self.stdout.write(
+                f'{name}: '
+                + (
+                    f'держит {limit} одновременных клиентов'
+                    if limit
+                    else 'не держит и минимальную нагрузку'
+                )
+            )
+
+    def login(self, url, options):
+        client = Client(url, Stats())
+        tokens = []
+        for number in range(options['accounts']):
+            token = client.json(
+                'login',
+                'POST',
+                '/api/auth/token/login/',
+                {
+                    'email': f'gen{options["seed"]}_{number}@example.com',
+                    'password': GENERATED_PASSWORD,
+                },
+            )
+            if token is not None:
+                tokens.append(token['auth_token'])
+        if not tokens:
+            raise CommandError(f'Не удалось авторизоваться на {url}.')
+        return tokens
+
+    def run_level(self, url, tokens, level, options):
+        stats = Stats()
+        deadline = time.monotonic() + options['duration']
+        workers = [
+            threading.Thread(
+                target=self.run_client,
+                args=(
+                    url,
+                    tokens[number % len(tokens)],
+                    random.Random(options['seed'] * 1000 + number),
+                    stats,
+                    deadline,
+                    options,
+                ),
+                daemon=True,
+            )
+            for number in range(level)
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        durations = sorted(
+            duration
+            for durations in stats.durations.values()
+            for duration in durations
+        )
+        if not durations:
+            raise CommandError(f'Не выполнено ни одного запроса к {url}.')
+        errors = sum(stats.errors.values()) / len(durations) * 100
+        p95 = percentile(durations, 95) * 1000
+        ok = errors <= options['max_errors'] and p95 <= options['max_p95']
+        self.stdout.write(
+            f'{"OK  " if ok else "FAIL"} клиентов {level:>5}: '
+            f'{len(durations) / elapsed:>8.1f} RPS, ошибок {errors:.1f}%, '
+            + ', '.join(
+                f'p{percent} {percentile(durations, percent) * 1000:.1f} мс'
+                for percent in PERCENTILES
+            )
+        )
+        return ok
+
+    def run_client(self, url, token, rnd, stats, deadline, options):
+        client = Client(url, stats)
+        client.headers['Authorization'] = f'Token {token}'
+        while time.monotonic() < deadline:
+            page = rnd.randint(1, options['pages'])
+            recipes = client.json(
+                'recipes list', 'GET', f'/api/recipes/?page={page}&limit=6'
+            )
+            if recipes and recipes['results']:
+                recipe = rnd.choice(recipes['results'])['id']
+                client.request('recipe', 'GET', f'/api/recipes/{recipe}/')
+            client.request(
+                'ingredients search',
+                'GET',
+                '/api/ingredients/?name='
+                + quote(f'ингредиент {rnd.randint(1, 99)}'),
+            )
+            client.request(
+                'shopping cart download',
+                'GET',
+                '/api/recipes/download_shopping_cart/',
+            )
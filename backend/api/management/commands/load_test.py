@@ -0,0 +1,188 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.generators import GENERATED_PASSWORD
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(durations, percent):
+    index = max(0, math.ceil(len(durations) * percent / 100) - 1)
+    return durations[index]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, duration, status):
+        with self.lock:
+            self.durations[name].append(duration)
+            if status == 0 or status >= 500:
+                self.errors[name] += 1
+
+
+class Client:
+    def __init__(self, base_url, stats):
+        parts = urlsplit(base_url)
+        connection_class = (
+            HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        )
+        self.connection = connection_class(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+        self.headers = {'Content-Type': 'application/json'}
+        self.stats = stats
+
+    def request(self, name, method, path, data=None):
+        body = json.dumps(data) if data is not None else None
+        started = time.perf_counter()
+        try:
+            self.connection.request(
+                method, self.prefix + path, body=body, headers=self.headers
+            )
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+        except (OSError, HTTPException):
+            self.connection.close()
+            content, status = b'', 0
+        self.stats.add(name, time.perf_counter() - started, status)
+        return status, content
+
+    def json(self, name, method, path, data=None):
+        status, content = self.request(name, method, path, data)
+        if status != 200:
+            return None
+        return json.loads(content)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API: повторяем сценарий фронтенда '
+        'и считаем RPS и перцентили времени ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', default=10, type=int)
+        parser.add_argument(
+            '--duration', default=30, type=int, help='Секунды.'
+        )
+        parser.add_argument(
+            '--seed',
+            default=0,
+            type=int,
+            help='--seed, с которым запускалась команда generate_data.',
+        )
+        parser.add_argument(
+            '--accounts',
+            default=100,
+            type=int,
+            help='Сколько сгенерированных пользователей использовать.',
+        )
+        parser.add_argument(
+            '--pages',
+            default=10,
+            type=int,
+            help='Из скольких первых страниц выбирать список рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        stats = Stats()
+        deadline = time.monotonic() + options['duration']
+        workers = [
+            threading.Thread(
+                target=self.run_user,
+                args=(number, stats, deadline, options),
+                daemon=True,
+            )
+            for number in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        if not stats.durations:
+            raise CommandError('Не выполнено ни одного запроса.')
+        self.report(stats, elapsed)
+
+    def run_user(self, number, stats, deadline, options):
+        rnd = random.Random(options['seed'] * 1000 + number)
+        client = Client(options['url'], stats)
+        email = (
+            f'gen{options["seed"]}_{number % options["accounts"]}'
+            '@example.com'
+        )
+        token = client.json(
+            'login',
+            'POST',
+            '/api/auth/token/login/',
+            {'email': email, 'password': GENERATED_PASSWORD},
+        )
+        if token is None:
+            return
+        client.headers['Authorization'] = f'Token {token["auth_token"]}'
+        tags = client.json('tags', 'GET', '/api/tags/') or []
+        tag_query = ''.join(f'&tags={tag["slug"]}' for tag in tags[:2])
+        while time.monotonic() < deadline:
+            page = rnd.randint(1, options['pages'])
+            client.request(
+                'recipes list', 'GET', f'/api/recipes/?page={page}&limit=6'
+            )
+            recipes = client.json(
+                'recipes by tags',
+                'GET',
+                f'/api/recipes/?page=1&limit=6{tag_query}',
+            )
+            if not recipes or not recipes['results']:
+                continue
+            recipe = f'/api/recipes/{rnd.choice(recipes["results"])["id"]}'
+            client.request('recipe', 'GET', f'{recipe}/')
+            client.request('favorite add', 'POST', f'{recipe}/favorite/')
+            client.request(
+                'shopping cart add', 'POST', f'{recipe}/shopping_cart/'
+            )
+            client.request(
+                'shopping cart download',
+                'GET',
+                '/api/recipes/download_shopping_cart/',
+            )
+            client.request('favorite delete', 'DELETE', f'{recipe}/favorite/')
+            client.request(
+                'shopping cart delete', 'DELETE', f'{recipe}/shopping_cart/'
+            )
+
+    def report(self, stats, elapsed):
+        header = f'{"эндпоинт":<24}{"запросов":>10}{"ошибок":>8}{"RPS":>9}'
+        header += ''.join(
+            f'{f"p{percent}, мс":>11}' for percent in PERCENTILES
+        )
+        self.stdout.write(header)
+        total = 0
+        for name, durations in stats.durations.items():
+            durations = sorted(durations)
+            total += len(durations)
+            line = (
+                f'{name:<24}{len(durations):>10}{stats.errors[name]:>8}'
+                f'{len(durations) / elapsed:>9.1f}'
+            )
+            line += ''.join(
+                f'{percentile(durations, percent) * 1000:>11.1f}'
+                for percent in PERCENTILES
+            )
+            self.stdout.write(line)
+        self.stdout.write(
+            f'Всего запросов: {total} за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} RPS'
+        )
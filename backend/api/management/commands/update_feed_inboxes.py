@@ -0,0 +1,47 @@
+from api.feed import disable_feed_inbox, enable_feed_inbox
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Включаем готовую ленту для пользователей с большим числом подписок '
+        'и отключаем для остальных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=settings.FEED_INBOX_SUBSCRIPTIONS,
+            help='Минимальное количество подписок для готовой ленты.',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Заново заполнить уже включённые ленты.',
+        )
+
+    def handle(self, *args, **options):
+        heavy = set(
+            Subscription.objects.order_by()
+            .values('subscriber')
+            .annotate(count=Count('pk'))
+            .filter(count__gte=options['threshold'])
+            .values_list('subscriber', flat=True)
+        )
+        enabled = set(
+            User.objects.filter(feed_inbox=True).values_list('pk', flat=True)
+        )
+        for user_id in enabled - heavy:
+            disable_feed_inbox(user_id)
+        for user_id in heavy if options['rebuild'] else heavy - enabled:
+            enable_feed_inbox(user_id)
+        self.stdout.write(
+            f'Готовых лент: {len(heavy)}, '
+            f'включено: {len(heavy - enabled)}, '
+            f'отключено: {len(enabled - heavy)}'
+        )
+        self.stdout.write(self.style.SUCCESS('Готово!'))
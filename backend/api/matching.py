@@ -0,0 +1,116 @@
+import heapq
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import AmountRecipe
+
+MATCH_SEQUENCE_KEY = 'match:sequence'
+MATCH_CHANGE_KEY = 'match:change:{}'
+MATCH_CHANGE_TIMEOUT = 60 * 60 * 24
+MATCH_REBUILD = 0
+MAX_REPLAYED_CHANGES = 1000
+
+
+def record_recipe_changes(recipe_ids=None):
+    def record():
+        cache.add(MATCH_SEQUENCE_KEY, 0, timeout=None)
+        for recipe_id in recipe_ids or (MATCH_REBUILD,):
+            sequence = cache.incr(MATCH_SEQUENCE_KEY)
+            cache.set(
+                MATCH_CHANGE_KEY.format(sequence),
+                recipe_id,
+                timeout=MATCH_CHANGE_TIMEOUT,
+            )
+
+    transaction.on_commit(record)
+
+
+class RecipeMatchIndex:
+    def __init__(self):
+        self.sequence = None
+        self.postings = {}
+        self.recipes = {}
+        self.lock = threading.Lock()
+
+    def build(self):
+        ingredients = defaultdict(list)
+        rows = AmountRecipe.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        )
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            ingredients[recipe_id].append(ingredient_id)
+        postings = defaultdict(lambda: array('q'))
+        for recipe_id, ingredient_ids in ingredients.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].append(recipe_id)
+        self.postings = dict(postings)
+        self.recipes = {
+            recipe_id: frozenset(ingredient_ids)
+            for recipe_id, ingredient_ids in ingredients.items()
+        }
+
+    def reload(self, recipe_ids):
+        ingredients = defaultdict(set)
+        rows = AmountRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].add(ingredient_id)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.recipes.pop(recipe_id, ()):
+                self.postings[ingredient_id].remove(recipe_id)
+            if recipe_id not in ingredients:
+                continue
+            self.recipes[recipe_id] = frozenset(ingredients[recipe_id])
+            for ingredient_id in ingredients[recipe_id]:
+                self.postings.setdefault(ingredient_id, array('q')).append(
+                    recipe_id
+                )
+
+    def get_changes(self, sequence):
+        if (
+            self.sequence is None
+            or sequence < self.sequence
+            or sequence - self.sequence > MAX_REPLAYED_CHANGES
+        ):
+            return None
+        keys = [
+            MATCH_CHANGE_KEY.format(number)
+            for number in range(self.sequence + 1, sequence + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys) or MATCH_REBUILD in changes.values():
+            return None
+        return set(changes.values())
+
+    def refresh(self):
+        sequence = cache.get(MATCH_SEQUENCE_KEY, 0)
+        if sequence == self.sequence:
+            return
+        changes = self.get_changes(sequence)
+        if changes is None:
+            self.build()
+        else:
+            self.reload(changes)
+        self.sequence = sequence
+
+    def match(self, ingredient_ids, limit):
+        with self.lock:
+            self.refresh()
+            counts = Counter()
+            for ingredient_id in set(ingredient_ids):
+                counts.update(self.postings.get(ingredient_id, ()))
+            return heapq.nlargest(
+                limit,
+                (
+                    (count / len(self.recipes[recipe_id]), count, recipe_id)
+                    for recipe_id, count in counts.items()
+                ),
+            )
+
+
+recipe_match_index = RecipeMatchIndex()
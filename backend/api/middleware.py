@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db_router import choose_replica, read_database
+from foodgram.db_threads import run_in_db_thread
+
+logger = logging.getLogger('foodgram.performance')
+
+REPLICA_PIN_KEY = 'replica:pin:{}'
+
+query_metrics = ContextVar('query_metrics', default=None)
+
+
+class QueryMetrics:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = query_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+class AsyncCapableMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.process(request)
+
+
+class PerformanceMetricsMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process(self, request):
+        metrics, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            query_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def start(self, request):
+        request.render_started = request.render_finished = None
+        metrics = QueryMetrics()
+        return metrics, query_metrics.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, started):
+        total = time.perf_counter() - started
+        render = 0.0
+        if request.render_started and request.render_finished:
+            render = request.render_finished - request.render_started
+        timings = {
+            'db': metrics.duration * 1000,
+            'app': (total - metrics.duration - render) * 1000,
+            'render': render * 1000,
+            'total': total * 1000,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.1f}'
+            + (f';desc="{metrics.count} queries"' if name == 'db' else '')
+            for name, duration in timings.items()
+        )
+        view_name = None
+        if request.resolver_match:
+            view_name = request.resolver_match.view_name
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': metrics.count,
+        }
+        for name, duration in timings.items():
+            record[f'{name}_ms'] = round(duration, 1)
+        logger.info(json.dumps(record))
+        return response
+
+    def process_template_response(self, request, response):
+        if response.is_rendered:
+            return response
+        request.render_started = time.perf_counter()
+
+        def render_finished(response):
+            request.render_finished = time.perf_counter()
+
+        response.add_post_render_callback(render_finished)
+        return response
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        if not settings.REPLICA_WEIGHTS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def get_pin_key(self, request):
+        client = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.META.get('HTTP_X_REAL_IP')
+            or request.META.get('REMOTE_ADDR')
+        )
+        digest = hashlib.sha1(str(client).encode()).hexdigest()
+        return REPLICA_PIN_KEY.format(digest)
+
+    def get_read_database(self, request):
+        if request.method in SAFE_METHODS and not cache.get(
+            self.get_pin_key(request)
+        ):
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            cache.set(
+                self.get_pin_key(request),
+                True,
+                settings.REPLICA_STICKY_SECONDS,
+            )
+
+    def process(self, request):
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+        token = read_database.set(self.get_read_database(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith('/api/'):
+            return await self.get_response(request)
+        token = read_database.set(
+            await run_in_db_thread(self.get_read_database, request)
+        )
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        await run_in_db_thread(self.pin, request, response)
+        return response
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+ERROR_INVALID_CURSOR = 'Некорректный курсор!'
+ERROR_INVALID_PAGE = 'Некорректный номер страницы!'
+TRUE_VALUES = ('1', 'true', 'True')
+
+
+class KeysetPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    keyset_only = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset_field = getattr(view, 'keyset_field', 'pk')
+        self.keyset = (
+            self.keyset_only or self.cursor_query_param in request.query_params
+        )
+        self.with_count = (
+            request.query_params.get(
+                self.count_query_param, str(not self.keyset)
+            )
+            in TRUE_VALUES
+        )
+        if not self.keyset and self.with_count:
+            return super().paginate_queryset(queryset, request, view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.count = queryset.count() if self.with_count else None
+        if self.keyset:
+            queryset = queryset.order_by(f'-{self.keyset_field}')
+            cursor = self.get_cursor(request)
+            if cursor is not None:
+                queryset = queryset.filter(
+                    **{f'{self.keyset_field}__lt': cursor}
+                )
+            results = list(queryset[: page_size + 1])
+        else:
+            queryset = self.order_for_offset(queryset)
+            self.page_number = self.get_page_number_value(request)
+            offset = (self.page_number - 1) * page_size
+            results = list(queryset[offset: offset + page_size + 1])
+        self.has_next = len(results) > page_size
+        self.results = results[:page_size]
+        return self.results
+
+    def order_for_offset(self, queryset):
+        # Без курсора сохраняем порядок запроса (например, релевантность
+        # поиска), добавляя ключ только для однозначности страниц.
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        tiebreaker = f'-{self.keyset_field}'
+        if tiebreaker not in ordering:
+            ordering.append(tiebreaker)
+        return queryset.order_by(*ordering)
+
+    def get_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return int(cursor)
+        except ValueError:
+            raise NotFound(ERROR_INVALID_CURSOR)
+
+    def get_page_number_value(self, request):
+        try:
+            page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            raise NotFound(ERROR_INVALID_PAGE)
+        if page_number < 1:
+            raise NotFound(ERROR_INVALID_PAGE)
+        return page_number
+
+    def get_paginated_response(self, data):
+        if not self.keyset and self.with_count:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ('count', self.count),
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
+
+    def get_next_link(self):
+        if not self.keyset and self.with_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.keyset:
+            return replace_query_param(
+                url,
+                self.cursor_query_param,
+                getattr(self.results[-1], self.keyset_field),
+            )
+        return replace_query_param(
+            url, self.page_query_param, self.page_number + 1
+        )
+
+    def get_previous_link(self):
+        if not self.keyset and self.with_count:
+            return super().get_previous_link()
+        if self.keyset or self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1
+        )
+
+
+class FeedPagination(KeysetPagination):
+    keyset_only = True
@@ -1,19 +1,18 @@
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import SerializerMethodField
 
-from recipes.models import (
-    AmountRecipe,
-    Favorite,
-    Ingredient,
-    Purchase,
-    Recipe,
-    RecipeTag,
-    Tag,
-)
+from recipes.images import image_url, image_urls, schedule_renditions
+from recipes.models import (AmountRecipe, Ingredient, Purchase, Recipe,
+                            RecipeTag, Tag)
+from recipes.signals import recipe_ingredients_changed
 from users.models import Subscription, User
 
+from .utils import change_shopping_cart, get_recipes_limit
+from .viewer_state import get_viewer_state
+
 ERROR_AMOUNT_VALUE = 'Количество ингредиента должно быть больше нуля!'
 ERROR_COOKING_TIME = 'Время приготовления должно быть больше нуля!'
 ERROR_COUNT_TAGS = 'Невозможно создать рецепт без тегов!'
@@ -21,6 +20,26 @@ ERROR_COUNT_INGREDIENTS = 'Невозможно создать рецепт бе
 ERROR_UNIQUE_TAGS = 'Теги в рецепте должны быть уникальными!'
 ERROR_UNIQUE_INGREDIENTS = 'Ингредиенты в рецепте должны быть уникальными!'
 ERROR_AMOUNT = 'Количество ингредиента должно быть больше 1!'
+ERROR_INGREDIENT_NOT_FOUND = 'Ингредиенты не найдены: {}!'
+ERROR_BULK_SIZE = 'Укажите от 1 до {} идентификаторов!'
+BULK_MAX_ITEMS = 100
+
+
+class RecipeImageField(serializers.Field):
+    def __init__(self, rendition=None, **kwargs):
+        self.rendition = rendition
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        url = image_url(
+            recipe, self.rendition or self.context.get('image_rendition')
+        )
+        request = self.context.get('request')
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
 
 
 class UserSerializerList(UserSerializer):
@@ -38,10 +57,8 @@ class UserSerializerList(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        current_user = self.context.get('request').user.pk
-        return Subscription.objects.filter(
-            author=obj.pk, subscriber=current_user
-        ).exists()
+        viewer_state = get_viewer_state(self.context.get('request'))
+        return obj.pk in viewer_state.following
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -80,17 +97,23 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        current_user = self.context.get('request').user.pk
-        return Subscription.objects.filter(
-            author=obj.author, subscriber=current_user
-        ).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        viewer_state = get_viewer_state(self.context.get('request'))
+        return obj.author_id in viewer_state.following
 
     def get_recipes(self, obj):
-        recipes = obj.author.recipes.all()
+        if hasattr(obj.author, 'latest_recipes'):
+            recipes = obj.author.latest_recipes
+        else:
+            recipes = obj.author.recipes.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit is not None:
+                recipes = recipes[:limit]
         return RecipeShortSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        return obj.author.recipes.count()
+        return obj.author.recipes_count
 
 
 class SubscribeAddSerializer(serializers.ModelSerializer):
@@ -137,7 +160,8 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 
 class RecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RecipeImageField()
+    image_renditions = serializers.SerializerMethodField()
     tags = TagSerializer(many=True)
     author = UserSerializerList()
     ingredients = IngredientInRecipeSerializer(
@@ -157,25 +181,32 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_renditions',
             'text',
             'cooking_time',
         )
 
+    def get_image_renditions(self, obj):
+        request = self.context.get('request')
+        urls = image_urls(obj)
+        if request:
+            return {
+                rendition: request.build_absolute_uri(url)
+                for rendition, url in urls.items()
+            }
+        return urls
+
     def get_is_favorited(self, obj):
-        current_user = self.context.get('request').user.pk
-        return Favorite.objects.filter(
-            user=current_user, recipes=obj.pk
-        ).exists()
+        viewer_state = get_viewer_state(self.context.get('request'))
+        return obj.pk in viewer_state.favorites
 
     def get_is_in_shopping_cart(self, obj):
-        current_user = self.context.get('request').user.pk
-        return Purchase.objects.filter(
-            user=current_user, recipes=obj.pk
-        ).exists()
+        viewer_state = get_viewer_state(self.context.get('request'))
+        return obj.pk in viewer_state.shopping_cart
 
 
 class IngredientInRecipeWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -234,67 +265,138 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             ingredients.append(ingredient['id'])
         if len(ingredients) > len(set(ingredients)):
             raise serializers.ValidationError(ERROR_UNIQUE_INGREDIENTS)
+        existing = Ingredient.objects.in_bulk(ingredients)
+        missing = [str(pk) for pk in ingredients if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                {
+                    'ingredients': ERROR_INGREDIENT_NOT_FOUND.format(
+                        ', '.join(missing)
+                    )
+                }
+            )
+        for ingredient in attrs['amount_recipes']:
+            ingredient['ingredient'] = existing[ingredient['id']]
         return attrs
 
     def get_is_favorited(self, obj):
-        current_user = self.context.get('request').user.pk
-        return Favorite.objects.filter(
-            user=current_user, recipes=obj.pk
-        ).exists()
+        viewer_state = get_viewer_state(self.context.get('request'))
+        return obj.pk in viewer_state.favorites
 
     def get_is_in_shopping_cart(self, obj):
-        current_user = self.context.get('request').user.pk
-        return Purchase.objects.filter(
-            user=current_user, recipes=obj.pk
-        ).exists()
+        viewer_state = get_viewer_state(self.context.get('request'))
+        return obj.pk in viewer_state.shopping_cart
 
     def add_ingredients(self, recipe, ingredients):
-        ingredients_list = []
-        for ingredient in ingredients:
-            ingredient_temp = Ingredient.objects.get(pk=ingredient['id'])
-            ingredients_list.append(
-                AmountRecipe(
-                    recipe=recipe,
-                    ingredient=ingredient_temp,
-                    amount=ingredient['amount'],
-                )
+        return AmountRecipe.objects.bulk_create(
+            AmountRecipe(
+                recipe=recipe,
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount'],
             )
-        return AmountRecipe.objects.bulk_create(ingredients_list)
+            for ingredient in ingredients
+        )
 
+    def update_ingredients(self, recipe, ingredients):
+        current = {
+            amount.ingredient_id: amount
+            for amount in AmountRecipe.objects.filter(recipe=recipe)
+        }
+        new_ingredients = []
+        changed_amounts = []
+        deltas = {}
+        for ingredient in ingredients:
+            amount = current.pop(ingredient['id'], None)
+            if amount is None:
+                new_ingredients.append(ingredient)
+                deltas[ingredient['id']] = ingredient['amount']
+            elif amount.amount != ingredient['amount']:
+                deltas[ingredient['id']] = ingredient['amount'] - amount.amount
+                amount.amount = ingredient['amount']
+                changed_amounts.append(amount)
+        # Удалённые ингредиенты вычитает из списков покупок post_delete.
+        if current:
+            AmountRecipe.objects.filter(
+                pk__in=[amount.pk for amount in current.values()]
+            ).delete()
+        change_shopping_cart(
+            Purchase.objects.filter(recipes=recipe).values_list(
+                'user', flat=True
+            ),
+            deltas,
+        )
+        if changed_amounts:
+            AmountRecipe.objects.bulk_update(changed_amounts, ['amount'])
+        if new_ingredients:
+            self.add_ingredients(recipe, new_ingredients)
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('amount_recipes')
         recipe = Recipe.objects.create(author=author, **validated_data)
-        tag_list = []
-        for tag in tags:
-            tag_list.append(RecipeTag(recipe=recipe, tag=tag))
-        RecipeTag.objects.bulk_create(tag_list)
-        ingredients = self.context['request'].data['ingredients']
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag) for tag in tags
+        )
         self.add_ingredients(recipe, ingredients)
+        recipe_ingredients_changed.send(sender=Recipe, recipe_ids=[recipe.pk])
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        schedule_renditions(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('amount_recipes')
-        ingredients = self.context['request'].data['ingredients']
-        AmountRecipe.objects.filter(recipe=instance).delete()
-        self.add_ingredients(instance, ingredients)
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
+        self.update_ingredients(
+            instance, validated_data.pop('amount_recipes')
+        )
+        recipe_ingredients_changed.send(
+            sender=Recipe, recipe_ids=[instance.pk]
+        )
+        instance.tags.set(validated_data.pop('tags'))
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time
         )
-        instance.image = validated_data.get('image', instance.image)
-        instance.save()
+        update_fields = ['name', 'text', 'cooking_time']
+        if 'image' in validated_data:
+            instance.image = validated_data['image']
+            instance.renditions_ready = False
+            update_fields += ['image', 'renditions_ready']
+        instance.save(update_fields=update_fields)
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        if not instance.renditions_ready:
+            schedule_renditions(instance)
         return instance
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().get(pk=instance.pk)
         return RecipeSerializer(instance, context=self.context).data
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = RecipeImageField(rendition='card')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class IdsField(serializers.ListField):
+    child = serializers.IntegerField()
+
+    def __init__(self, **kwargs):
+        kwargs['min_length'] = 1
+        kwargs['max_length'] = BULK_MAX_ITEMS
+        error = ERROR_BULK_SIZE.format(BULK_MAX_ITEMS)
+        kwargs['error_messages'] = {'min_length': error, 'max_length': error}
+        super().__init__(**kwargs)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = IdsField()
+
+
+class AuthorIdsSerializer(serializers.Serializer):
+    authors = IdsField()
@@ -0,0 +1,292 @@
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.images import schedule_renditions_cleanup
+from recipes.models import (AmountRecipe, Favorite, Ingredient, Purchase,
+                            Recipe, Tag)
+from recipes.signals import (ingredients_loaded, recipe_ingredients_changed,
+                             recipes_changed)
+from users.models import Subscription, User
+
+from .authentication import invalidate_token, invalidate_user_tokens
+from .cache import invalidate_on_commit, invalidate_reference_cache
+from .feed import add_author_to_feed, fan_out_recipe, remove_author_from_feed
+from .matching import record_recipe_changes
+from .middleware import record_query
+from .utils import change_counter, change_shopping_cart, get_recipe_amounts
+from .viewer_state import invalidate_viewer_state
+
+# Связи, созданные или удалённые через ORM (админка, shell, фикстуры), меняют
+# счётчики здесь; эндпоинты API пишут связи сырым SQL и меняют их сами.
+COUNTED_RELATIONS = {
+    Favorite: ('recipes_id', Recipe, 'favorites_count'),
+    Purchase: ('recipes_id', Recipe, 'in_carts_count'),
+    Subscription: ('author_id', User, 'followers_count'),
+    Recipe: ('author_id', User, 'recipes_count'),
+}
+# Поля автора, которые попадают в закэшированные ответы со списком рецептов.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    invalidate_reference_cache('tags')
+    invalidate_on_commit('recipes')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(ingredients_loaded)
+def invalidate_ingredients(sender, **kwargs):
+    invalidate_reference_cache('ingredients')
+    invalidate_on_commit('recipes')
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update_search_vector()
+
+
+@receiver(post_save, sender=AmountRecipe)
+@receiver(post_delete, sender=AmountRecipe)
+def record_amount_change(sender, instance, **kwargs):
+    record_recipe_changes([instance.recipe_id])
+
+
+@receiver(recipe_ingredients_changed)
+def record_ingredient_changes(sender, recipe_ids=None, **kwargs):
+    record_recipe_changes(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(recipes_changed)
+def invalidate_recipes(sender, **kwargs):
+    invalidate_on_commit('recipes')
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_recipe(sender, instance, update_fields=None, **kwargs):
+    instance.previous_row = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not {'image', 'author'}.intersection(update_fields)
+    ):
+        return
+    instance.previous_row = (
+        sender.objects.filter(pk=instance.pk).only('image', 'author').first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def remove_replaced_renditions(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous_row', None)
+    if previous and previous.image.name != instance.image.name:
+        schedule_renditions_cleanup(previous.image.name)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_renditions(sender, instance, **kwargs):
+    if instance.image:
+        schedule_renditions_cleanup(instance.image.name)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(sender, instance, update_fields=None, **kwargs):
+    instance.previous_author_fields = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields).intersection(AUTHOR_FIELDS)
+    ):
+        return
+    instance.previous_author_fields = (
+        sender.objects.filter(
+            pk=instance.pk,
+            pk__in=Recipe.objects.values('author').order_by(),
+        )
+        .values(*AUTHOR_FIELDS)
+        .first()
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous_author_fields', None)
+    if previous is None:
+        return
+    deferred = instance.get_deferred_fields()
+    if any(
+        getattr(instance, name) != value
+        for name, value in previous.items()
+        if name not in deferred
+    ):
+        invalidate_on_commit('recipes')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def invalidate_recipe_flags(sender, instance, **kwargs):
+    invalidate_viewer_state(instance.user_id)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscriptions(sender, instance, **kwargs):
+    invalidate_viewer_state(instance.subscriber_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+
+@receiver(pre_save, sender=AmountRecipe)
+@receiver(pre_save, sender=Purchase)
+@receiver(pre_save, sender=Favorite)
+@receiver(pre_save, sender=Subscription)
+def remember_previous_row(sender, instance, **kwargs):
+    instance.previous_row = None
+    if instance.pk is not None:
+        instance.previous_row = sender.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Purchase)
+@receiver(post_save, sender=Subscription)
+@receiver(post_save, sender=Recipe)
+def count_saved_relation(sender, instance, created, **kwargs):
+    field, model, counter = COUNTED_RELATIONS[sender]
+    target_id = getattr(instance, field)
+    previous = getattr(instance, 'previous_row', None)
+    if previous is None:
+        if not created:
+            return
+    elif getattr(previous, field) == target_id:
+        return
+    else:
+        change_counter(model, getattr(previous, field), counter, -1)
+    change_counter(model, target_id, counter, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Purchase)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=Recipe)
+def count_deleted_relation(sender, instance, **kwargs):
+    field, model, counter = COUNTED_RELATIONS[sender]
+    change_counter(model, getattr(instance, field), counter, -1)
+
+
+def change_recipe_carts(recipe_id, amounts):
+    change_shopping_cart(
+        Purchase.objects.filter(recipes=recipe_id).values_list(
+            'user', flat=True
+        ),
+        amounts,
+    )
+
+
+# Список покупок — сумма по парам «покупка — ингредиент рецепта», поэтому
+# при каскадном удалении рецепта каждую пару вычитает та сторона, которая
+# удаляется первой: вторая её уже не найдёт.
+@receiver(post_save, sender=AmountRecipe)
+def update_carts_on_amount_save(sender, instance, **kwargs):
+    deltas = defaultdict(Counter)
+    deltas[instance.recipe_id][instance.ingredient_id] += instance.amount
+    previous = getattr(instance, 'previous_row', None)
+    if previous is not None:
+        deltas[previous.recipe_id][previous.ingredient_id] -= previous.amount
+    for recipe_id, amounts in deltas.items():
+        change_recipe_carts(recipe_id, amounts)
+
+
+@receiver(post_delete, sender=AmountRecipe)
+def update_carts_on_amount_delete(sender, instance, **kwargs):
+    change_recipe_carts(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+@receiver(post_save, sender=Purchase)
+def add_purchase_to_cart(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous_row', None)
+    if previous is not None:
+        if (previous.user_id, previous.recipes_id) == (
+            instance.user_id,
+            instance.recipes_id,
+        ):
+            return
+        remove_purchase_from_cart(sender, previous)
+    change_shopping_cart(
+        [instance.user_id], get_recipe_amounts([instance.recipes_id])
+    )
+
+
+@receiver(post_delete, sender=Purchase)
+def remove_purchase_from_cart(sender, instance, **kwargs):
+    change_shopping_cart(
+        [instance.user_id],
+        get_recipe_amounts([instance.recipes_id], sign=-1),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def add_subscription_to_feed(sender, instance, created, **kwargs):
+    if created:
+        add_author_to_feed(instance)
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_subscription_from_feed(sender, instance, **kwargs):
+    remove_author_from_feed(instance)
+
+
+@receiver(connection_created)
+def mark_connection_checked(sender, connection, **kwargs):
+    connection.health_checked_at = time.monotonic()
+
+
+@receiver(connection_created)
+def add_query_metrics(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    if not settings.DB_HEALTH_CHECK_INTERVAL:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        checked_at = getattr(connection, 'health_checked_at', 0)
+        if now - checked_at < settings.DB_HEALTH_CHECK_INTERVAL:
+            continue
+        connection.health_checked_at = now
+        if not connection.is_usable():
+            connection.close()
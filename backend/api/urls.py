@@ -1,12 +1,18 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (DownloadShoppingCart, FavoriteViewSet, IngredientViewSet,
-                    RecipesViewSet, ShoppingCartViewSet, SubscribeViewSet,
-                    SubscriptionViewSet, TagViewSet)
+from .async_views import async_view
+from .views import (DatabasePoolStats, DownloadShoppingCart, FavoriteBulkView,
+                    FavoriteViewSet, FeedViewSet, IngredientViewSet,
+                    RecipesViewSet, ReferenceCacheStats, ShoppingCartBulkView,
+                    ShoppingCartViewSet, SubscribeBulkView, SubscribeViewSet,
+                    SubscriptionViewSet, TagViewSet, ViewerStateView)
 
 app_name = 'api'
 
+ASYNC_ROUTES = ('recipes-list', 'recipes-detail', 'ingredients-list')
+
 router = DefaultRouter()
 
 router.register('tags', TagViewSet, basename='tags')
@@ -30,10 +36,23 @@ router.register(
     basename='subscribes',
 )
 router.register('recipes', RecipesViewSet, basename='recipes')
+router.register('feed', FeedViewSet, basename='feed')
 
+download_shopping_cart = DownloadShoppingCart.as_view()
+if settings.ASYNC_VIEWS:
+    download_shopping_cart = async_view(download_shopping_cart)
+    for pattern in router.urls:
+        if pattern.name in ASYNC_ROUTES:
+            pattern.callback = async_view(pattern.callback)
 
 urlpatterns = [
-    path('recipes/download_shopping_cart/', DownloadShoppingCart.as_view()),
+    path('recipes/download_shopping_cart/', download_shopping_cart),
+    path('recipes/favorite/', FavoriteBulkView.as_view()),
+    path('recipes/shopping_cart/', ShoppingCartBulkView.as_view()),
+    path('users/subscribe/', SubscribeBulkView.as_view()),
+    path('cache_stats/', ReferenceCacheStats.as_view()),
+    path('db_pool_stats/', DatabasePoolStats.as_view()),
+    path('users/me/state/', ViewerStateView.as_view()),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
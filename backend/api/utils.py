@@ -1,24 +1,256 @@
-from django.db.models import Sum
-from django.http import FileResponse
+import csv
 
-from recipes.models import AmountRecipe
+from django.db import connections, router
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 
+from recipes.models import AmountRecipe, CartIngredient
 
-def download_shopping_cart(request):
-    user = request.user
-    ingredients = (
-        AmountRecipe.objects.filter(recipe__purchases__user=user)
-        .values('ingredient__name', 'ingredient__measurement_unit')
-        .annotate(amount=Sum('amount'))
+SHOPPING_CART_FILE_NAME = 'shopping_cart'
+SHOPPING_CART_CHUNK_SIZE = 2000
+SHOPPING_CART_BATCH_SIZE = 5000
+SHOPPING_CART_CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+ERROR_IDS = 'Идентификаторы должны быть целыми числами!'
+
+
+def change_counter(model, pk, field, delta):
+    return change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    if not pks:
+        return 0
+    # Счётчик мог разойтись с данными (например, после bulk_create), а
+    # столбец беззнаковый: не даём уйти ниже нуля.
+    return model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def get_relation_sql(model, user_field, target_field):
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    target_model = model._meta.get_field(target_field).related_model
+    return (
+        connection,
+        quote(model._meta.db_table),
+        quote(model._meta.get_field(user_field).column),
+        quote(model._meta.get_field(target_field).column),
+        quote(target_model._meta.db_table),
+        quote(target_model._meta.pk.column),
+    )
+
+
+def insert_relations(model, user_field, target_field, user_id, target_ids):
+    if not target_ids:
+        return set()
+    (
+        connection,
+        table,
+        user_column,
+        target_column,
+        target_table,
+        target_pk,
+    ) = get_relation_sql(model, user_field, target_field)
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    # Блокируем найденные строки, чтобы их не удалили до проверки внешнего
+    # ключа при коммите; удалённые раньше просто не попадут в выборку.
+    lock = ' FOR KEY SHARE' if connection.vendor == 'postgresql' else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {target_column}) '
+            f'SELECT %s, {target_pk} FROM {target_table} '
+            f'WHERE {target_pk} IN ({placeholders}){lock} '
+            f'ON CONFLICT DO NOTHING RETURNING {target_column}',
+            [user_id, *target_ids],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_relations(model, user_field, target_field, user_id, target_ids):
+    if not target_ids:
+        return set()
+    connection, table, user_column, target_column, _, _ = get_relation_sql(
+        model, user_field, target_field
+    )
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {target_column} IN ({placeholders}) '
+            f'RETURNING {target_column}',
+            [user_id, *target_ids],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def get_ids(request, name):
+    values = request.query_params.getlist(name)
+    if not values:
+        return None
+    try:
+        return {int(value) for value in values}
+    except ValueError:
+        raise ValidationError({name: ERROR_IDS})
+
+
+def get_recipe_amounts(recipe_ids, sign=1):
+    amounts = (
+        AmountRecipe.objects.filter(recipe__in=recipe_ids)
         .order_by()
+        .values_list('ingredient')
+        .annotate(amount=Sum('amount'))
+    )
+    return {ingredient_id: sign * amount for ingredient_id, amount in amounts}
+
+
+def add_to_shopping_cart(user_ids, amounts):
+    connection, table, user_column, ingredient_column, _, _ = (
+        get_relation_sql(CartIngredient, 'user', 'ingredient')
+    )
+    amount_column = connection.ops.quote_name(
+        CartIngredient._meta.get_field('amount').column
+    )
+    rows = [
+        (user_id, pk, amount)
+        for user_id in user_ids
+        for pk, amount in amounts.items()
+    ]
+    batch_size = min(
+        SHOPPING_CART_BATCH_SIZE,
+        connection.ops.bulk_batch_size(['user', 'ingredient', 'amount'], rows),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'({user_column}, {ingredient_column}, {amount_column}) '
+                f'VALUES {values} '
+                f'ON CONFLICT ({user_column}, {ingredient_column}) '
+                f'DO UPDATE SET {amount_column} = '
+                f'{table}.{amount_column} + EXCLUDED.{amount_column}',
+                [value for row in batch for value in row],
+            )
+
+
+def change_shopping_cart(user_ids, amounts):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    # Прибавление — один upsert, поэтому оно не теряется, даже если
+    # параллельный запрос только что обнулил и удалил строку. Вычитание не
+    # создаёт строк, а удаление перепроверяет amount = 0 под блокировкой.
+    added = {pk: amount for pk, amount in amounts.items() if amount > 0}
+    removed = {pk: amount for pk, amount in amounts.items() if amount < 0}
+    if added:
+        add_to_shopping_cart(user_ids, added)
+    if removed:
+        ingredients = CartIngredient.objects.filter(
+            user__in=user_ids, ingredient__in=removed
+        )
+        delta = Case(
+            *(
+                When(ingredient=pk, then=Value(amount))
+                for pk, amount in removed.items()
+            ),
+            output_field=IntegerField(),
+        )
+        ingredients.update(amount=Greatest(F('amount') + delta, 0))
+        ingredients.filter(amount=0).delete()
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_shopping_cart(user):
+    return (
+        CartIngredient.objects.filter(user=user)
+        .values(
+            'ingredient',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount',
+        )
+        .order_by(
+            'ingredient__name', 'ingredient__measurement_unit', 'ingredient'
+        )
+    )
+
+
+def get_shopping_cart_after(ingredient):
+    name = ingredient['ingredient__name']
+    unit = ingredient['ingredient__measurement_unit']
+    return (
+        Q(ingredient__name__gt=name)
+        | Q(ingredient__name=name, ingredient__measurement_unit__gt=unit)
+        | Q(
+            ingredient__name=name,
+            ingredient__measurement_unit=unit,
+            ingredient__gt=ingredient['ingredient'],
+        )
+    )
+
+
+def iter_shopping_cart(user):
+    # Читаем пачками по ключу сортировки, а не серверным курсором: каждая
+    # пачка — отдельный запрос, поэтому между пачками соединение свободно,
+    # а в режиме ASGI их можно читать в любом потоке пула.
+    ingredients = get_shopping_cart(user)
+    batch = list(ingredients[:SHOPPING_CART_CHUNK_SIZE])
+    while batch:
+        for ingredient in batch:
+            yield (
+                ingredient['ingredient__name'],
+                ingredient['amount'],
+                ingredient['ingredient__measurement_unit'],
+            )
+        if len(batch) < SHOPPING_CART_CHUNK_SIZE:
+            return
+        batch = list(
+            ingredients.filter(get_shopping_cart_after(batch[-1]))[
+                :SHOPPING_CART_CHUNK_SIZE
+            ]
+        )
+
+
+def shopping_cart_txt(rows):
+    for name, amount, measurement_unit in rows:
+        yield f'{name} - {amount} {measurement_unit}\n'
+
+
+def shopping_cart_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_CART_CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': (shopping_cart_txt, 'text/plain; charset=utf-8'),
+    'csv': (shopping_cart_csv, 'text/csv; charset=utf-8'),
+}
+
+
+def download_shopping_cart(user, file_format='txt'):
+    render, content_type = SHOPPING_CART_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        render(iter_shopping_cart(user)), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{SHOPPING_CART_FILE_NAME}.{file_format}"'
     )
-    f = open("shopping_cart.txt", "w+")
-    for ingredient in ingredients:
-        name = ingredient['ingredient__name']
-        measurement_unit = ingredient['ingredient__measurement_unit']
-        amount = ingredient['amount']
-        f.write(f'{name} - {amount} {measurement_unit}\n')
-    f.close()
-    f = open("shopping_cart.txt", "r")
-    response = FileResponse(f, content_type='text/plain')
     return response
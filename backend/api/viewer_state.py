@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.db_router import read_from_primary
+from recipes.models import Favorite, Purchase
+from users.models import Subscription
+
+VIEWER_STATE_KEY = 'viewer:state:{}'
+
+
+class ViewerState:
+    def __init__(self, favorites=(), shopping_cart=(), following=()):
+        self.favorites = frozenset(favorites)
+        self.shopping_cart = frozenset(shopping_cart)
+        self.following = frozenset(following)
+
+    def as_dict(self, recipes=None, authors=None):
+        favorites, shopping_cart = self.favorites, self.shopping_cart
+        following = self.following
+        if recipes is not None:
+            favorites = favorites & recipes
+            shopping_cart = shopping_cart & recipes
+        if authors is not None:
+            following = following & authors
+        return {
+            'favorites': sorted(favorites),
+            'shopping_cart': sorted(shopping_cart),
+            'subscriptions': sorted(following),
+        }
+
+
+EMPTY_VIEWER_STATE = ViewerState()
+
+
+def load_viewer_state(user):
+    return ViewerState(
+        favorites=Favorite.objects.filter(user=user).values_list(
+            'recipes_id', flat=True
+        ),
+        shopping_cart=Purchase.objects.filter(user=user).values_list(
+            'recipes_id', flat=True
+        ),
+        following=Subscription.objects.filter(subscriber=user).values_list(
+            'author_id', flat=True
+        ),
+    )
+
+
+def get_viewer_state(request):
+    state = getattr(request, 'viewer_state', None)
+    if state is not None:
+        return state
+    user = request.user if request else None
+    if user is None or not user.is_authenticated:
+        state = EMPTY_VIEWER_STATE
+    else:
+        key = VIEWER_STATE_KEY.format(user.pk)
+        state = cache.get(key)
+        if state is None:
+            with read_from_primary():
+                state = load_viewer_state(user)
+            cache.set(key, state, timeout=settings.VIEWER_STATE_TIMEOUT)
+    if request:
+        request.viewer_state = state
+    return state
+
+
+def invalidate_viewer_state(user_id):
+    transaction.on_commit(
+        lambda: cache.delete(VIEWER_STATE_KEY.format(user_id))
+    )
@@ -1,19 +1,35 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Prefetch, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import permissions, status, viewsets
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from recipes.models import Favorite, Ingredient, Purchase, Recipe, Tag
+from foodgram.db_pool import get_pool_stats
+from recipes.models import (Favorite, FeedItem, Ingredient, Purchase, Recipe,
+                            Tag)
 from users.models import Subscription, User
 
+from .autocomplete import ingredient_index
+from .cache import (
+    AnonymousResponseCacheMixin,
+    ReferenceCacheMixin,
+    get_reference_cache_stats,
+)
+from .feed import add_feed_items, remove_authors_from_feed
 from .filters import IngredientFilter, RecipeFilter
+from .matching import recipe_match_index
+from .pagination import FeedPagination, KeysetPagination
 from .permissions import AuthorOrReadOnly
 from .serializers import (
+    AuthorIdsSerializer,
     IngredientSerializer,
+    RecipeIdsSerializer,
     RecipeSerializer,
     RecipeShortSerializer,
     RecipeWriteSerializer,
@@ -22,7 +38,18 @@ from .serializers import (
     TagSerializer,
     UserSerializerList,
 )
-from .utils import download_shopping_cart
+from .utils import (
+    SHOPPING_CART_FORMATS,
+    change_counters,
+    change_shopping_cart,
+    delete_relations,
+    download_shopping_cart,
+    get_ids,
+    get_recipe_amounts,
+    get_recipes_limit,
+    insert_relations,
+)
+from .viewer_state import get_viewer_state, invalidate_viewer_state
 
 ERROR_ADD_TO_FAVORITE = 'Рецепт уже есть в избранном!'
 ERROR_DELETE_FROM_FAVORITE = 'Нет такого рецепта в избранном!'
@@ -30,170 +57,478 @@ ERROR_ADD_TO_CART = 'Рецепт уже есть в списке покупок
 ERROR_DELETE_FROM_CART = 'Нет такого рецепта в списке покупок!'
 ERROR_SUBSCRIBE = 'Такая подписка уже существует!'
 ERROR_UNSUBSCRIBE = 'Такой подписки не существует!'
+ERROR_SUBSCRIBE_SELF = 'Нельзя подписаться на самого себя!'
+ERROR_RECIPE_NOT_FOUND = 'Рецепт не найден!'
+ERROR_AUTHOR_NOT_FOUND = 'Автор не найден!'
+ERROR_FILE_FORMAT = 'Неподдерживаемый формат файла! Доступные форматы: {}.'
+ERROR_MATCH_INGREDIENTS = 'Укажите от 1 до {} ингредиентов!'
+ERROR_MATCH_LIMIT = 'Количество рецептов должно быть от 1 до {}!'
+MATCH_LIMIT = 10
+MATCH_MAX_LIMIT = 100
+MATCH_MAX_INGREDIENTS = 200
+
+
+class RelationMixin:
+    relation_model = None
+    user_field = 'user'
+    target_field = 'recipes'
+    target_model = Recipe
+    counter = None
+
+    def perform_create_relations(self, user, target_ids):
+        pass
+
+    def perform_destroy_relations(self, user, target_ids):
+        pass
+
+    def create_relations(self, user, target_ids):
+        with transaction.atomic():
+            created = insert_relations(
+                self.relation_model,
+                self.user_field,
+                self.target_field,
+                user.pk,
+                target_ids,
+            )
+            change_counters(self.target_model, created, self.counter, 1)
+            self.perform_create_relations(user, created)
+        if created:
+            invalidate_viewer_state(user.pk)
+        return created
+
+    def destroy_relations(self, user, target_ids):
+        with transaction.atomic():
+            deleted = delete_relations(
+                self.relation_model,
+                self.user_field,
+                self.target_field,
+                user.pk,
+                target_ids,
+            )
+            change_counters(self.target_model, deleted, self.counter, -1)
+            self.perform_destroy_relations(user, deleted)
+        if deleted:
+            invalidate_viewer_state(user.pk)
+        return deleted
+
+
+class FavoriteRelationMixin(RelationMixin):
+    relation_model = Favorite
+    counter = 'favorites_count'
+
+
+class ShoppingCartRelationMixin(RelationMixin):
+    relation_model = Purchase
+    counter = 'in_carts_count'
+
+    def perform_create_relations(self, user, target_ids):
+        change_shopping_cart([user.pk], get_recipe_amounts(target_ids))
+
+    def perform_destroy_relations(self, user, target_ids):
+        change_shopping_cart(
+            [user.pk], get_recipe_amounts(target_ids, sign=-1)
+        )
+
+
+class SubscriptionRelationMixin(RelationMixin):
+    relation_model = Subscription
+    user_field = 'subscriber'
+    target_field = 'author'
+    target_model = User
+    counter = 'followers_count'
+
+    def perform_create_relations(self, user, target_ids):
+        if user.feed_inbox:
+            add_feed_items(
+                user.pk,
+                Recipe.objects.filter(author__in=target_ids).values_list(
+                    'pk', flat=True
+                ),
+            )
+
+    def perform_destroy_relations(self, user, target_ids):
+        remove_authors_from_feed(user.pk, target_ids)
 
 
 class UserViewSet(ReadOnlyModelViewSet):
     serializer_class = UserSerializerList
-    queryset = User.objects.all()
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return User.objects.all()
 
 
 class SubscriptionViewSet(ModelViewSet):
     serializer_class = SubscriptionSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_queryset(self):
         current_user = self.request.user
-        return Subscription.objects.filter(subscriber=current_user)
+        limit = get_recipes_limit(self.request)
+        return (
+            Subscription.objects.filter(subscriber=current_user)
+            .select_related('author')
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .prefetch_related(
+                Prefetch(
+                    'author__recipes',
+                    queryset=Recipe.objects.latest_by_author(limit),
+                    to_attr='latest_recipes',
+                )
+            )
+            .order_by('-pk')
+        )
 
 
-class SubscribeViewSet(viewsets.ModelViewSet):
+class SubscribeViewSet(SubscriptionRelationMixin, viewsets.ModelViewSet):
     serializer_class = SubscribeAddSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
     def create(self, request, *args, **kwargs):
         current_user = self.request.user
-        user_id = self.kwargs.get('user_id')
-        user = get_object_or_404(User, pk=user_id)
-        exists_subscribe = Subscription.objects.filter(
-            author=user, subscriber=current_user
-        ).exists()
-        if exists_subscribe:
+        user = get_object_or_404(User, pk=self.kwargs.get('user_id'))
+        if user.pk == current_user.pk:
+            return Response(
+                {'errors': ERROR_SUBSCRIBE_SELF},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not self.create_relations(current_user, [user.pk]):
+            get_object_or_404(User, pk=user.pk)
             return Response(
                 {'errors': ERROR_SUBSCRIBE},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        data = {'author': user.pk, 'subscriber': current_user.pk}
-        serializer = SubscribeAddSerializer(
-            data=data, context={'request': request}
+        subscription = Subscription(author=user, subscriber=current_user)
+        subscription.is_subscribed = True
+        serializer = SubscriptionSerializer(
+            subscription, context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(methods=['DELETE'], detail=False)
     def delete(self, request, *args, **kwargs):
-        current_user = self.request.user
         user_id = self.kwargs.get('user_id')
-        user = get_object_or_404(User, pk=user_id)
-        exists_subscribe = Subscription.objects.filter(
-            author=user, subscriber=current_user
-        ).exists()
-        if not exists_subscribe:
-            return Response(
-                {'errors': ERROR_UNSUBSCRIBE},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        Subscription.objects.filter(
-            author=user, subscriber=current_user
-        ).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if self.destroy_relations(self.request.user, [int(user_id)]):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, pk=user_id)
+        return Response(
+            {'errors': ERROR_UNSUBSCRIBE},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(ReferenceCacheMixin, ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    reference_name = 'tags'
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = [IngredientFilter]
     pagination_class = None
-    search_fields = ('^name',)
+    reference_name = 'ingredients'
 
+    def list(self, request, *args, **kwargs):
+        if (
+            not settings.INGREDIENT_INDEX_ENABLED
+            or not request.query_params.get(IngredientFilter.search_param)
+        ):
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.search, request, *args, **kwargs)
 
-class RecipesViewSet(ModelViewSet):
-    queryset = Recipe.objects.all()
+    def search(self, request, *args, **kwargs):
+        return Response(
+            ingredient_index.search(
+                request.query_params[IngredientFilter.search_param],
+                settings.INGREDIENT_SEARCH_LIMIT,
+            )
+        )
+
+
+class RecipesViewSet(AnonymousResponseCacheMixin, ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (AuthorOrReadOnly,)
+    reference_name = 'recipes'
+    cache_query_params = ('page', 'limit', 'tags', 'author', 'cursor', 'count')
+
+    def get_queryset(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return Recipe.objects.all()
+        return Recipe.objects.with_related()
 
     def get_serializer_class(self):
         if self.request.method == 'POST' or self.request.method == 'PATCH':
             return RecipeWriteSerializer
         return RecipeSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['image_rendition'] = (
+            'card' if self.action in ('list', 'match') else 'detail'
+        )
+        return context
+
+    def get_match_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', MATCH_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MATCH_MAX_LIMIT:
+            raise ValidationError(
+                {'limit': ERROR_MATCH_LIMIT.format(MATCH_MAX_LIMIT)}
+            )
+        return limit
 
-class FavoriteViewSet(ModelViewSet):
+    @action(detail=False, methods=('get',))
+    def match(self, request):
+        ingredient_ids = get_ids(request, 'ingredients')
+        if not ingredient_ids or len(ingredient_ids) > MATCH_MAX_INGREDIENTS:
+            raise ValidationError(
+                {
+                    'ingredients': ERROR_MATCH_INGREDIENTS.format(
+                        MATCH_MAX_INGREDIENTS
+                    )
+                }
+            )
+        matches = recipe_match_index.match(
+            ingredient_ids, self.get_match_limit()
+        )
+        recipes = Recipe.objects.with_related().in_bulk(
+            [recipe_id for _, _, recipe_id in matches]
+        )
+        matches = [match for match in matches if match[2] in recipes]
+        data = RecipeSerializer(
+            [recipes[recipe_id] for _, _, recipe_id in matches],
+            many=True,
+            context=self.get_serializer_context(),
+        ).data
+        for item, (coverage, matched, _) in zip(data, matches):
+            item['coverage'] = round(coverage, 4)
+            item['matched_ingredients'] = matched
+        return Response(data)
+
+
+class FeedViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = RecipeSerializer
+    pagination_class = FeedPagination
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.feed_inbox:
+            self.keyset_field = 'recipe_id'
+            return FeedItem.objects.filter(user=user).prefetch_related(
+                Prefetch('recipe', queryset=Recipe.objects.with_related())
+            )
+        self.keyset_field = 'pk'
+        return Recipe.objects.filter(
+            author__in=get_viewer_state(self.request).following
+        ).with_related()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['image_rendition'] = 'card'
+        return context
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        if self.keyset_field == 'recipe_id':
+            page = [item.recipe for item in page]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class FavoriteViewSet(FavoriteRelationMixin, ModelViewSet):
     permission_classes = (permissions.IsAuthenticated,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
     def create(self, request, *args, **kwargs):
-        user = self.request.user
-        recipe_id = self.kwargs.get('recipe_id')
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        exists_favorite = Favorite.objects.filter(
-            user=user, recipes=recipe
-        ).exists()
-        if exists_favorite:
+        recipe = get_object_or_404(Recipe, pk=self.kwargs.get('recipe_id'))
+        if not self.create_relations(self.request.user, [recipe.pk]):
+            get_object_or_404(Recipe, pk=recipe.pk)
             return Response(
                 {'errors': ERROR_ADD_TO_FAVORITE},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        Favorite.objects.create(user=user, recipes=recipe)
         serializer = RecipeShortSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(methods=['DELETE'], detail=False)
     def delete(self, request, *args, **kwargs):
-        user = self.request.user
         recipe_id = self.kwargs.get('recipe_id')
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        exists_favorite = Favorite.objects.filter(
-            user=user, recipes=recipe
-        ).exists()
-        if not exists_favorite:
-            return Response(
-                {'errors': ERROR_DELETE_FROM_FAVORITE},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        Favorite.objects.filter(user=user, recipes=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if self.destroy_relations(self.request.user, [int(recipe_id)]):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, pk=recipe_id)
+        return Response(
+            {'errors': ERROR_DELETE_FROM_FAVORITE},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
 
-class ShoppingCartViewSet(ModelViewSet):
+class ShoppingCartViewSet(ShoppingCartRelationMixin, ModelViewSet):
     permission_classes = (permissions.IsAuthenticated,)
     queryset = Purchase.objects.all()
 
     def create(self, request, *args, **kwargs):
-        user = self.request.user
-        recipe_id = self.kwargs.get('recipe_id')
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        exists_shopping_cart = Purchase.objects.filter(
-            user=user, recipes=recipe
-        ).exists()
-        if exists_shopping_cart:
+        recipe = get_object_or_404(Recipe, pk=self.kwargs.get('recipe_id'))
+        if not self.create_relations(self.request.user, [recipe.pk]):
+            get_object_or_404(Recipe, pk=recipe.pk)
             return Response(
                 {'errors': ERROR_ADD_TO_CART},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        Purchase.objects.create(user=user, recipes=recipe)
         serializer = RecipeShortSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(methods=['DELETE'], detail=False)
     def delete(self, request, *args, **kwargs):
-        user = self.request.user
         recipe_id = self.kwargs.get('recipe_id')
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        exists_shopping_cart = Purchase.objects.filter(
-            user=user, recipes=recipe
-        ).exists()
-        if not exists_shopping_cart:
+        if self.destroy_relations(self.request.user, [int(recipe_id)]):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, pk=recipe_id)
+        return Response(
+            {'errors': ERROR_DELETE_FROM_CART},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class BulkRelationView(RelationMixin, APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+    ids_serializer_class = RecipeIdsSerializer
+    ids_field = 'recipes'
+    error_exists = None
+    error_missing = None
+    error_not_found = ERROR_RECIPE_NOT_FOUND
+
+    def get_ids(self, request):
+        serializer = self.ids_serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data[self.ids_field]))
+
+    def get_errors(self, user, ids):
+        found = set(
+            self.target_model.objects.filter(pk__in=ids).values_list(
+                'pk', flat=True
+            )
+        )
+        return {
+            pk: (status.HTTP_404_NOT_FOUND, self.error_not_found)
+            for pk in ids
+            if pk not in found
+        }
+
+    def get_create_errors(self, user, ids):
+        return {}
+
+    def get_response(self, ids, errors, done_status):
+        results = []
+        for pk in ids:
+            if pk in errors:
+                item_status, error = errors[pk]
+                results.append(
+                    {'id': pk, 'status': item_status, 'errors': error}
+                )
+            else:
+                results.append({'id': pk, 'status': done_status})
+        return Response({'results': results})
+
+    def post(self, request):
+        user = request.user
+        ids = self.get_ids(request)
+        errors = self.get_create_errors(user, ids)
+        valid_ids = [pk for pk in ids if pk not in errors]
+        created = self.create_relations(user, valid_ids)
+        not_created = [pk for pk in valid_ids if pk not in created]
+        errors.update(self.get_errors(user, not_created))
+        for pk in not_created:
+            if pk not in errors:
+                errors[pk] = (status.HTTP_400_BAD_REQUEST, self.error_exists)
+        return self.get_response(ids, errors, status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        user = request.user
+        ids = self.get_ids(request)
+        errors = self.get_errors(user, ids)
+        valid_ids = [pk for pk in ids if pk not in errors]
+        deleted = self.destroy_relations(user, valid_ids)
+        for pk in valid_ids:
+            if pk not in deleted:
+                errors[pk] = (status.HTTP_400_BAD_REQUEST, self.error_missing)
+        return self.get_response(ids, errors, status.HTTP_204_NO_CONTENT)
+
+
+class FavoriteBulkView(FavoriteRelationMixin, BulkRelationView):
+    error_exists = ERROR_ADD_TO_FAVORITE
+    error_missing = ERROR_DELETE_FROM_FAVORITE
+
+
+class ShoppingCartBulkView(ShoppingCartRelationMixin, BulkRelationView):
+    error_exists = ERROR_ADD_TO_CART
+    error_missing = ERROR_DELETE_FROM_CART
+
+
+class SubscribeBulkView(SubscriptionRelationMixin, BulkRelationView):
+    ids_serializer_class = AuthorIdsSerializer
+    ids_field = 'authors'
+    error_exists = ERROR_SUBSCRIBE
+    error_missing = ERROR_UNSUBSCRIBE
+    error_not_found = ERROR_AUTHOR_NOT_FOUND
+
+    def get_create_errors(self, user, ids):
+        errors = super().get_create_errors(user, ids)
+        if user.pk in ids:
+            errors[user.pk] = (
+                status.HTTP_400_BAD_REQUEST,
+                ERROR_SUBSCRIBE_SELF,
+            )
+        return errors
+
+
+class DownloadShoppingCart(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
             return Response(
-                {'errors': ERROR_DELETE_FROM_CART},
+                {
+                    'errors': ERROR_FILE_FORMAT.format(
+                        ', '.join(SHOPPING_CART_FORMATS)
+                    )
+                },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        Purchase.objects.filter(user=user, recipes=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return download_shopping_cart(request.user, file_format)
 
 
-class DownloadShoppingCart(APIView):
+class ReferenceCacheStats(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_reference_cache_stats())
+
+
+class DatabasePoolStats(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_pool_stats())
+
+
+class ViewerStateView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get(self, request):
-        return download_shopping_cart(request)
+        viewer_state = get_viewer_state(request)
+        return Response(
+            viewer_state.as_dict(
+                recipes=get_ids(request, 'recipes'),
+                authors=get_ids(request, 'authors'),
+            )
+        )
@@ -1,7 +1,37 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
-application = get_asgi_application()
+
+class StreamingASGIHandler(ASGIHandler):
+    async def send_response(self, response, send):
+        chunks = getattr(response, 'async_streaming_content', None)
+        if chunks is None:
+            return await super().send_response(response, send)
+
+        async def send_with_chunks(message):
+            if message['type'] == 'http.response.body' and not message.get(
+                'more_body'
+            ):
+                try:
+                    async for chunk in chunks:
+                        await send(
+                            {
+                                'type': 'http.response.body',
+                                'body': chunk,
+                                'more_body': True,
+                            }
+                        )
+                finally:
+                    await chunks.aclose()
+            await send(message)
+
+        await super().send_response(response, send_with_chunks)
+
+
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
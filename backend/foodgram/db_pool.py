@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import OperationalError
+
+ERROR_POOL_TIMEOUT = 'Нет свободных соединений с базой {}!'
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, name, size, timeout, health_check_interval):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = deque()
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def checkout(self, connect, is_usable):
+        started = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.timeouts += 1
+            raise OperationalError(ERROR_POOL_TIMEOUT.format(self.name))
+        wait = time.perf_counter() - started
+        try:
+            connection = self.get_idle(is_usable)
+            created = connection is None
+            if created:
+                connection = connect()
+        except BaseException:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.created += created
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        return connection
+
+    def get_idle(self, is_usable):
+        while True:
+            try:
+                connection, released_at = self.idle.pop()
+            except IndexError:
+                return None
+            idle_for = time.monotonic() - released_at
+            if (
+                not self.health_check_interval
+                or idle_for < self.health_check_interval
+                or is_usable(connection)
+            ):
+                return connection
+            self.discard(connection)
+
+    def checkin(self, connection, reusable=True):
+        try:
+            if reusable:
+                self.idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.discarded += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'checkouts': self.checkouts,
+                'created': self.created,
+                'discarded': self.discarded,
+                'timeouts': self.timeouts,
+                'wait_avg_ms': round(
+                    self.wait_total / self.checkouts * 1000, 3
+                )
+                if self.checkouts
+                else None,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+def get_pool(name):
+    pool = pools.get(name)
+    if pool is None:
+        with pools_lock:
+            pool = pools.get(name)
+            if pool is None:
+                pool = pools[name] = ConnectionPool(
+                    name,
+                    settings.DB_POOL_SIZE,
+                    settings.DB_POOL_TIMEOUT,
+                    settings.DB_HEALTH_CHECK_INTERVAL,
+                )
+    return pool
+
+
+def get_pool_stats():
+    return {name: pool.get_stats() for name, pool in pools.items()}
@@ -0,0 +1,69 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+read_database = ContextVar('read_database', default=DEFAULT_DB_ALIAS)
+unhealthy_until = {}
+
+
+def get_healthy_replicas():
+    now = time.monotonic()
+    return {
+        alias: weight
+        for alias, weight in settings.REPLICA_WEIGHTS.items()
+        if unhealthy_until.get(alias, 0) <= now
+    }
+
+
+def mark_unhealthy(alias):
+    unhealthy_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def choose_replica():
+    replicas = get_healthy_replicas()
+    while replicas:
+        alias = random.choices(
+            list(replicas), weights=list(replicas.values())
+        )[0]
+        try:
+            connections[alias].ensure_connection()
+        except OperationalError:
+            logger.warning('Реплика %s недоступна', alias, exc_info=True)
+            mark_unhealthy(alias)
+            del replicas[alias]
+            continue
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+# Кэши сбрасываются после записи, а реплика может отставать: заполняем их
+# только чтением из основной базы, иначе устаревшие данные попадут в кэш
+# под новой версией и останутся там до следующей инвалидации.
+@contextmanager
+def read_from_primary():
+    token = read_database.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
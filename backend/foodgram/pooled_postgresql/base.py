@@ -0,0 +1,61 @@
+from functools import partial
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from foodgram.db_pool import get_pool
+
+Database = base.Database
+
+
+def connect(conn_params):
+    connection = Database.connect(**conn_params)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+def is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        connection.rollback()
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self):
+        return get_pool(f'{self.alias}:{self.settings_dict["NAME"]}')
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().checkout(
+            partial(connect, conn_params), is_usable
+        )
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        reusable = not self.connection.closed
+        if reusable:
+            status = self.connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                reusable = False
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    self.connection.rollback()
+                except Database.Error:
+                    reusable = False
+        self.get_pool().checkin(self.connection, reusable)
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMetricsMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +44,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+PERFORMANCE_METRICS_ENABLED = (
+    os.getenv('PERFORMANCE_METRICS_ENABLED', default='True') == 'True'
+)
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -72,9 +78,115 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
         'PORT': os.getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+    }
+}
+
+# Пул соединений внутри процесса (только PostgreSQL), 0 — без пула.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', default=0))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', default=5))
+if DB_POOL_SIZE and DATABASES['default']['ENGINE'] == (
+    'django.db.backends.postgresql'
+):
+    DATABASES['default']['ENGINE'] = 'foodgram.pooled_postgresql'
+
+# Соединение, простаивавшее дольше этого времени, проверяется перед
+# использованием, 0 — не проверять.
+DB_HEALTH_CHECK_INTERVAL = int(
+    os.getenv('DB_HEALTH_CHECK_INTERVAL', default=30)
+)
+
+# Реплики для чтения: DB_REPLICAS=host[:port][*weight],... (для SQLite вместо
+# адреса указывается путь к файлу базы).
+REPLICA_WEIGHTS = {}
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', default='').split(',')), start=1
+):
+    location, _, weight = replica.strip().partition('*')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES[alias]['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = location
+    else:
+        host, _, port = location.partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+        DATABASES[alias]['OPTIONS'] = {
+            'connect_timeout': int(
+                os.getenv('DB_REPLICA_CONNECT_TIMEOUT', default=2)
+            ),
+        }
+    REPLICA_WEIGHTS[alias] = int(weight or 1)
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=10))
+
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', default=30))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
     }
 }
 
+REFERENCE_CACHE_TIMEOUT = int(
+    os.getenv('REFERENCE_CACHE_TIMEOUT', default=60 * 60 * 24)
+)
+
+INGREDIENT_INDEX_ENABLED = (
+    os.getenv('INGREDIENT_INDEX_ENABLED', default='True') == 'True'
+)
+
+INGREDIENT_SEARCH_LIMIT = int(
+    os.getenv('INGREDIENT_SEARCH_LIMIT', default=20)
+)
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RESPONSE_CACHE_TIMEOUT', default=60 * 5)
+)
+
+RESPONSE_CACHE_STALE = (
+    os.getenv('RESPONSE_CACHE_STALE', default='True') == 'True'
+)
+
+# LocMemCache у каждого процесса свой: сброс состояния пользователя виден
+# только там, где прошла запись, поэтому без общего кэша храним его недолго.
+LOCAL_CACHE = CACHES['default']['BACKEND'].endswith('.LocMemCache')
+
+VIEWER_STATE_TIMEOUT = int(
+    os.getenv('VIEWER_STATE_TIMEOUT', default=5 if LOCAL_CACHE else 60 * 5)
+)
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=60)
+)
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', default=10000))
+
+IMAGE_RENDITION_WORKERS = int(
+    os.getenv('IMAGE_RENDITION_WORKERS', default=2)
+)
+
+FEED_INBOX_SUBSCRIPTIONS = int(
+    os.getenv('FEED_INBOX_SUBSCRIPTIONS', default=1000)
+)
+
+# Включается в foodgram/asgi.py: при запуске через ASGI основные эндпоинты
+# чтения обслуживаются асинхронными представлениями.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
+
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', default=8))
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -97,9 +209,9 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
     'PAGE_SIZE': 6,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -130,6 +242,21 @@ USE_L10N = True
 
 USE_TZ = True
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('PERFORMANCE_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 STATIC_URL = '/backend_static/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
@@ -0,0 +1,20 @@
+import os
+
+ERROR_LOCAL_CACHE = (
+    'При GUNICORN_WORKERS больше 1 нужен общий кэш (CACHE_BACKEND): '
+    'у LocMemCache кэш свой в каждом процессе, и сброс кэшей после записи '
+    'не доходит до остальных воркеров.'
+)
+
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+wsgi_app = f'foodgram.{SERVER_MODE}:application'
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+if workers > 1 and os.getenv(
+    'CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'
+).endswith('.LocMemCache'):
+    raise RuntimeError(ERROR_LOCAL_CACHE)
+threads = int(os.getenv('GUNICORN_THREADS', default=1))
+if SERVER_MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
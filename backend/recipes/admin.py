@@ -77,6 +77,10 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ['show_ingredients', 'count_favorite']
     inlines = (IngredientAmountInline, TagsInline)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
+
     def show_ingredients(self, obj):
         return "\n".join([a.name for a in obj.ingredients.all()])
 
@@ -84,9 +88,10 @@ class RecipeAdmin(admin.ModelAdmin):
         return "\n".join([a.name for a in obj.tags.all()])
 
     def count_favorite(self, obj):
-        return Favorite.objects.filter(recipes=obj).count()
+        return obj.favorites_count
 
     count_favorite.short_description = 'Количество добавления в избранное'
+    count_favorite.admin_order_field = 'favorites_count'
     show_ingredients.short_description = 'Ингредиенты'
     show_tags.short_description = 'Теги'
 
@@ -0,0 +1,177 @@
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from users.models import Subscription, User
+
+from .models import (AmountRecipe, Favorite, Ingredient, Purchase, Recipe,
+                     RecipeTag, Tag)
+from .signals import (ingredients_loaded, recipe_ingredients_changed,
+                      recipes_changed)
+
+PLACEHOLDER_IMAGE = 'media/generated.png'
+GENERATED_PASSWORD = 'generated-password'
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+DEFAULT_INGREDIENTS = 500
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'омлет', 'паста', 'плов',
+    'быстрый', 'домашний', 'летний', 'острый', 'сырный', 'овощной',
+)
+
+
+def ensure_placeholder_image():
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), '#E26C2D').save(buffer, 'PNG')
+        default_storage.save(PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue()))
+    return PLACEHOLDER_IMAGE
+
+
+def ensure_reference_data(rnd, batch_size):
+    if not Tag.objects.exists():
+        for name, color, slug in DEFAULT_TAGS:
+            Tag.objects.create(name=name, color=color, slug=slug)
+    if not Ingredient.objects.exists():
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f'ингредиент {number}',
+                    measurement_unit=rnd.choice(('г', 'мл', 'шт')),
+                )
+                for number in range(DEFAULT_INGREDIENTS)
+            ),
+            batch_size=batch_size,
+        )
+        ingredients_loaded.send(sender=Ingredient)
+    return (
+        list(Tag.objects.values_list('pk', flat=True)),
+        list(Ingredient.objects.values_list('pk', flat=True)),
+    )
+
+
+def sample_pairs(rnd, owners, targets, per_owner, exclude_self=False):
+    for owner in owners:
+        choices = rnd.sample(targets, min(per_owner, len(targets)))
+        for target in choices:
+            if exclude_self and target == owner:
+                continue
+            yield owner, target
+
+
+def generate_dataset(
+    users=100,
+    recipes=1000,
+    favorites=20,
+    purchases=5,
+    subscriptions=10,
+    ingredients=(3, 12),
+    seed=0,
+    batch_size=1000,
+):
+    rnd = random.Random(seed)
+    prefix = f'gen{seed}'
+    tag_ids, ingredient_ids = ensure_reference_data(rnd, batch_size)
+    image = ensure_placeholder_image()
+    password = make_password(GENERATED_PASSWORD)
+
+    User.objects.bulk_create(
+        (
+            User(
+                email=f'{prefix}_{number}@example.com',
+                username=f'{prefix}_{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for number in range(users)
+        ),
+        batch_size=batch_size,
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith=f'{prefix}_')
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=rnd.choice(user_ids),
+                name=f'{prefix} {rnd.choice(WORDS)} {rnd.choice(WORDS)}',
+                image=image,
+                text=' '.join(rnd.choices(WORDS, k=30)),
+                cooking_time=rnd.randint(5, 180),
+            )
+            for _ in range(recipes)
+        ),
+        batch_size=batch_size,
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(author_id__in=user_ids)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+    RecipeTag.objects.bulk_create(
+        (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rnd.sample(
+                tag_ids, rnd.randint(1, min(2, len(tag_ids)))
+            )
+        ),
+        batch_size=batch_size,
+    )
+    AmountRecipe.objects.bulk_create(
+        (
+            AmountRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rnd.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rnd.sample(
+                ingredient_ids,
+                min(rnd.randint(*ingredients), len(ingredient_ids)),
+            )
+        ),
+        batch_size=batch_size,
+    )
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user_id=user_id, recipes_id=recipe_id)
+            for user_id, recipe_id in sample_pairs(
+                rnd, user_ids, recipe_ids, favorites
+            )
+        ),
+        batch_size=batch_size,
+    )
+    Purchase.objects.bulk_create(
+        (
+            Purchase(user_id=user_id, recipes_id=recipe_id)
+            for user_id, recipe_id in sample_pairs(
+                rnd, user_ids, recipe_ids, purchases
+            )
+        ),
+        batch_size=batch_size,
+    )
+    Subscription.objects.bulk_create(
+        (
+            Subscription(subscriber_id=user_id, author_id=author_id)
+            for user_id, author_id in sample_pairs(
+                rnd, user_ids, user_ids, subscriptions, exclude_self=True
+            )
+        ),
+        batch_size=batch_size,
+    )
+    recipes_changed.send(sender=Recipe)
+    recipe_ingredients_changed.send(sender=Recipe, recipe_ids=None)
+    return user_ids, recipe_ids
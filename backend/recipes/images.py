@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, features
+
+from .signals import recipes_changed
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'card': (400, 300),
+    'detail': (800, 600),
+    'retina': (1600, 1200),
+}
+RENDITION_DIR = 'renditions'
+RENDITION_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+RENDITION_EXTENSION = RENDITION_FORMAT.lower()
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS,
+            thread_name_prefix='renditions',
+        )
+    return executor
+
+
+def rendition_name(image_name, rendition):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{RENDITION_DIR}/{stem}_{rendition}.{RENDITION_EXTENSION}'
+
+
+def image_url(recipe, rendition=None):
+    if not recipe.image:
+        return None
+    if rendition is None or not recipe.renditions_ready:
+        return recipe.image.url
+    return default_storage.url(rendition_name(recipe.image.name, rendition))
+
+
+def image_urls(recipe):
+    return {
+        rendition: image_url(recipe, rendition) for rendition in RENDITIONS
+    }
+
+
+def generate_renditions(recipe_id, image_name):
+    from .models import Recipe
+
+    with default_storage.open(image_name) as image_file:
+        original = Image.open(image_file)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+    if RENDITION_FORMAT == 'JPEG':
+        original = original.convert('RGB')
+    for rendition, size in RENDITIONS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, RENDITION_FORMAT, quality=82)
+        name = rendition_name(image_name, rendition)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        renditions_ready=True
+    )
+    if updated:
+        recipes_changed.send(sender=Recipe)
+    else:
+        delete_renditions(image_name)
+    return updated
+
+
+def delete_renditions(image_name):
+    from .models import Recipe
+
+    if Recipe.objects.filter(image=image_name).exists():
+        return
+    for rendition in RENDITIONS:
+        name = rendition_name(image_name, rendition)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+def schedule_renditions_cleanup(image_name):
+    transaction.on_commit(lambda: delete_renditions(image_name))
+
+
+def safe_generate_renditions(recipe_id, image_name):
+    try:
+        generate_renditions(recipe_id, image_name)
+    except Exception:
+        logger.exception('Не удалось создать превью рецепта %s', recipe_id)
+
+
+def run_in_background(recipe_id, image_name):
+    try:
+        safe_generate_renditions(recipe_id, image_name)
+    finally:
+        # Поток пула не держит соединение между задачами: оно возвращается
+        # в пул соединений или закрывается.
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    if not recipe.image:
+        return
+    recipe_id, image_name = recipe.pk, recipe.image.name
+
+    def submit():
+        if settings.IMAGE_RENDITION_WORKERS:
+            get_executor().submit(run_in_background, recipe_id, image_name)
+        else:
+            safe_generate_renditions(recipe_id, image_name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,66 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from recipes.generators import GENERATED_PASSWORD, generate_dataset
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Заполняем базу синтетическими данными для нагрузочных тестов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=10000, type=int)
+        parser.add_argument(
+            '--favorites',
+            default=20,
+            type=int,
+            help='Избранных рецептов на пользователя.',
+        )
+        parser.add_argument(
+            '--purchases',
+            default=5,
+            type=int,
+            help='Рецептов в списке покупок на пользователя.',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            default=10,
+            type=int,
+            help='Подписок на пользователя.',
+        )
+        parser.add_argument('--seed', default=0, type=int)
+        parser.add_argument('--batch-size', default=1000, type=int)
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        if User.objects.filter(username__startswith=f'gen{seed}_').exists():
+            raise CommandError(
+                f'Данные с --seed {seed} уже сгенерированы, '
+                'укажите другое значение.'
+            )
+        started = time.monotonic()
+        user_ids, recipe_ids = generate_dataset(
+            users=options['users'],
+            recipes=options['recipes'],
+            favorites=options['favorites'],
+            purchases=options['purchases'],
+            subscriptions=options['subscriptions'],
+            seed=seed,
+            batch_size=options['batch_size'],
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+        call_command('rebuild_shopping_carts', stdout=StringIO())
+        call_command('update_search_vectors', stdout=StringIO())
+        call_command('update_feed_inboxes', stdout=StringIO())
+        self.stdout.write(
+            f'Пользователей: {len(user_ids)}, рецептов: {len(recipe_ids)}, '
+            f'время: {time.monotonic() - started:.1f} с'
+        )
+        self.stdout.write(
+            f'Логины: gen{seed}_<номер>@example.com, '
+            f'пароль: {GENERATED_PASSWORD}'
+        )
+        self.stdout.write(self.style.SUCCESS('Данные успешно сгенерированы!'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from recipes.images import generate_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаём превью изображений для рецептов, у которых их нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать превью для всех рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(renditions_ready=False)
+        generated = failed = 0
+        for recipe_id, image_name in recipes.values_list('pk', 'image'):
+            try:
+                generate_renditions(recipe_id, image_name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+                continue
+            generated += 1
+        self.stdout.write(
+            f'Создано превью: {generated}, ошибок: {failed}'
+        )
+        self.stdout.write(self.style.SUCCESS('Готово!'))
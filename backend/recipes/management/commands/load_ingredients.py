@@ -1,9 +1,15 @@
 import csv
 import os
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from foodgram.settings import BASE_DIR
 from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
+
+DEFAULT_BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
@@ -13,18 +19,64 @@ class Command(BaseCommand):
         parser.add_argument(
             'file_name', default='ingredients.csv', nargs='?', type=str
         )
+        parser.add_argument(
+            '--batch-size',
+            default=DEFAULT_BATCH_SIZE,
+            type=int,
+            help='Количество строк, записываемых в базу за один запрос.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Прочитать файл и посчитать новые ингредиенты без записи.',
+        )
 
     def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        started = time.monotonic()
+        names = set(Ingredient.objects.values_list('name', flat=True))
+        rows_count = created_count = 0
         with open(
             os.path.join(os.path.join(BASE_DIR, 'data'), options['file_name']),
             newline='',
             encoding='utf-8',
-        ) as csvfile:
+        ) as csvfile, transaction.atomic():
             items = csv.reader(csvfile, delimiter=',')
-            for name, measurement_unit in items:
-                ex = Ingredient.objects.filter(name=name).exists()
-                if not ex:
-                    Ingredient.objects.create(
-                        name=name, measurement_unit=measurement_unit
+            while True:
+                chunk = list(islice(items, batch_size))
+                if not chunk:
+                    break
+                rows_count += len(chunk)
+                ingredients = []
+                for name, measurement_unit in chunk:
+                    if name in names:
+                        continue
+                    names.add(name)
+                    ingredients.append(
+                        Ingredient(
+                            name=name, measurement_unit=measurement_unit
+                        )
+                    )
+                if not dry_run:
+                    Ingredient.objects.bulk_create(
+                        ingredients, ignore_conflicts=True
                     )
-        print('Данные успешно загружены!')
+                created_count += len(ingredients)
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'Обработано строк: {rows_count}, '
+                        f'новых ингредиентов: {created_count}'
+                    )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Строк: {rows_count}, новых ингредиентов: {created_count}, '
+            f'время: {elapsed:.2f} с, '
+            f'скорость: {rows_count / max(elapsed, 1e-6):.0f} строк/с'
+        )
+        if dry_run:
+            self.stdout.write('Пробный запуск: данные не записаны.')
+            return
+        if created_count:
+            ingredients_loaded.send(sender=Ingredient)
+        self.stdout.write(self.style.SUCCESS('Данные успешно загружены!'))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, Q, Subquery,
+                              Sum)
+from django.db.models.functions import Coalesce
+from recipes.models import AmountRecipe, CartIngredient
+
+
+def get_expected_rows():
+    return (
+        AmountRecipe.objects.filter(recipe__purchases__isnull=False)
+        .order_by()
+        .values_list('recipe__purchases__user', 'ingredient')
+        .annotate(amount=Sum('amount'))
+    )
+
+
+def get_expected_amount():
+    return Coalesce(
+        Subquery(
+            AmountRecipe.objects.filter(
+                recipe__purchases__user=OuterRef('user'),
+                ingredient=OuterRef('ingredient'),
+            )
+            .order_by()
+            .values('ingredient')
+            .annotate(amount=Sum('amount'))
+            .values('amount'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересобираем сводные списки покупок из корзин пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество расхождений.',
+        )
+
+    def count_drifted(self, expected_count):
+        cart = CartIngredient.objects.annotate(
+            expected=get_expected_amount()
+        ).aggregate(
+            total=Count('pk'),
+            matched=Count('pk', filter=Q(amount=F('expected'))),
+            expected=Count('pk', filter=Q(expected__gt=0)),
+        )
+        # Расходятся строки списков с другим количеством и строки корзин,
+        # которых в списках нет вовсе.
+        return (
+            cart['total'] - cart['matched'] + expected_count - cart['expected']
+        )
+
+    def rebuild(self):
+        connection = connections[router.db_for_write(CartIngredient)]
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(CartIngredient._meta.get_field(name).column)
+            for name in ('user', 'ingredient', 'amount')
+        )
+        select, params = (
+            get_expected_rows()
+            .query.get_compiler(connection=connection)
+            .as_sql()
+        )
+        CartIngredient.objects.all().delete()
+        # Списки собираются одним INSERT ... SELECT ... GROUP BY в самой
+        # базе, без выгрузки корзин всех пользователей в память.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(CartIngredient._meta.db_table)} '
+                f'({columns}) {select}',
+                params,
+            )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected_count = get_expected_rows().count()
+            drifted = self.count_drifted(expected_count)
+            self.stdout.write(
+                f'Строк: {expected_count}, расхождений {drifted}'
+            )
+            if options['dry_run']:
+                self.stdout.write('Пробный запуск: списки не изменены.')
+                return
+            self.rebuild()
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны!'))
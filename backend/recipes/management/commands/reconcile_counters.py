@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Purchase, Recipe
+from users.models import Subscription, User
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipes'),
+    (Recipe, 'in_carts_count', Purchase, 'recipes'),
+    (User, 'followers_count', Subscription, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитываем счётчики избранного, покупок и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество расхождений.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, field, source, source_field in COUNTERS:
+                drifted = (
+                    model.objects.annotate(
+                        actual=count_subquery(source, source_field)
+                    )
+                    .exclude(**{field: F('actual')})
+                    .values('pk')
+                )
+                drifted_count = drifted.count()
+                if drifted_count and not options['dry_run']:
+                    model.objects.filter(pk__in=Subquery(drifted)).update(
+                        **{field: count_subquery(source, source_field)}
+                    )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}.{field}: '
+                    f'расхождений {drifted_count}'
+                )
+        if options['dry_run']:
+            self.stdout.write('Пробный запуск: счётчики не изменены.')
+            return
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны!'))
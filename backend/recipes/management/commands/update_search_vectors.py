@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересобираем поисковый индекс рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество рецептов в одном запросе.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        if not recipes.is_postgresql():
+            self.stdout.write('Поисковый индекс нужен только для PostgreSQL.')
+            return
+        started = time.monotonic()
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                recipes.filter(pk__gt=last_pk)[: options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            updated += Recipe.objects.filter(
+                pk__gte=batch[0], pk__lte=last_pk
+            ).update_search_vector()
+        self.stdout.write(
+            f'Обновлено рецептов: {updated} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
+        self.stdout.write(self.style.SUCCESS('Готово!'))
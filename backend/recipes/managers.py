@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, models
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef,
+                              Prefetch, Q, Subquery, Value, When)
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        from .models import AmountRecipe
+
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'amount_recipes',
+                queryset=AmountRecipe.objects.select_related('ingredient'),
+            ),
+        )
+
+    def latest_by_author(self, limit=None):
+        if limit is None:
+            return self
+        return self.filter(
+            pk__in=Subquery(
+                self.model.objects.filter(author=OuterRef('author'))
+                .order_by('-pk')
+                .values('pk')[:limit]
+            )
+        )
+
+    def is_postgresql(self):
+        return connections[self.db].vendor == 'postgresql'
+
+    def update_search_vector(self):
+        from .models import AmountRecipe
+
+        if not self.is_postgresql():
+            return 0
+        ingredient_names = Subquery(
+            AmountRecipe.objects.filter(recipe=OuterRef('pk'))
+            .values('recipe')
+            .annotate(names=StringAgg('ingredient__name', delimiter=' '))
+            .values('names')
+        )
+        config = settings.SEARCH_CONFIG
+        return self.update(
+            search_vector=SearchVector('name', weight='A', config=config)
+            + SearchVector(ingredient_names, weight='B', config=config)
+            + SearchVector('text', weight='C', config=config)
+        )
+
+    def search(self, text):
+        from .models import AmountRecipe
+
+        if self.is_postgresql():
+            query = SearchQuery(
+                text, config=settings.SEARCH_CONFIG, search_type='websearch'
+            )
+            return (
+                self.filter(search_vector=query)
+                .annotate(search_rank=SearchRank(F('search_vector'), query))
+                .order_by('-search_rank', '-pk')
+            )
+        return (
+            self.annotate(
+                in_ingredients=Exists(
+                    AmountRecipe.objects.filter(
+                        recipe=OuterRef('pk'),
+                        ingredient__name__icontains=text,
+                    )
+                )
+            )
+            .filter(
+                Q(name__icontains=text)
+                | Q(in_ingredients=True)
+                | Q(text__icontains=text)
+            )
+            .annotate(
+                search_rank=Case(
+                    When(name__icontains=text, then=Value(3)),
+                    When(in_ingredients=True, then=Value(2)),
+                    default=Value(1),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by('-search_rank', '-pk')
+        )
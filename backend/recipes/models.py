@@ -1,10 +1,16 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Lower
 
 from users.models import User
 
+from .managers import RecipeQuerySet
+
 ERROR_TIME_COOKING = 'Время приготовления должно быть больше 1 минуты!'
 ERROR_AMOUNT = 'Количество ингредиента должно быть больше 1!'
+COUNTER_FIELDS = ('favorites_count', 'in_carts_count')
 
 
 class Tag(models.Model):
@@ -29,6 +35,9 @@ class Ingredient(models.Model):
         ordering = ['-pk']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            models.Index(Lower('name'), name='ingredient_lower_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -60,11 +69,46 @@ class Recipe(models.Model):
         'Время приготовления (в минутах)',
         validators=[MinValueValidator(1, ERROR_TIME_COOKING)],
     )
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество добавлений в список покупок', default=0, editable=False
+    )
+    renditions_ready = models.BooleanField(
+        'Превью изображения готовы', default=False, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pk']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(fields=['author', '-id'], name='recipe_author_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ]
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        # Счётчики меняются только через F(): при сохранении объекта целиком
+        # (админка, shell) не записываем прочитанные раньше значения.
+        if update_fields is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(force_insert, force_update, using, update_fields)
 
     def __str__(self):
         return self.name
@@ -93,6 +137,11 @@ class RecipeTag(models.Model):
                 fields=['recipe', 'tag'], name='unique_recipe_tag'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'
+            ),
+        ]
 
 
 class AmountRecipe(models.Model):
@@ -165,3 +214,52 @@ class Purchase(models.Model):
                 fields=['user', 'recipes'], name='unique_purchases'
             ),
         ]
+
+
+class CartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='unique_cart_ingredient'
+            ),
+        ]
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_item'
+            ),
+        ]
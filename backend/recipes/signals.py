@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+ingredients_loaded = Signal()
+recipes_changed = Signal()
+recipe_ingredients_changed = Signal()
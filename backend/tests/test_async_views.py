@@ -0,0 +1,73 @@
+import contextvars
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from api.async_views import STREAM_BATCH_SIZE, async_view, iter_in_db_thread
+from foodgram.asgi import StreamingASGIHandler
+
+LINES = STREAM_BATCH_SIZE * 2 + 1
+
+
+class AsyncViewTest(SimpleTestCase):
+    def setUp(self):
+        self.threads = set()
+
+    def iter_lines(self):
+        for number in range(LINES):
+            self.threads.add(threading.get_ident())
+            yield f'{number}\n'.encode()
+
+    def test_unsafe_methods_run_sync_view(self):
+        view = async_view(lambda request: HttpResponse())
+        factory = RequestFactory()
+        for method, in_db_thread in (
+            ('get', True),
+            ('head', True),
+            ('post', False),
+            ('patch', False),
+            ('delete', False),
+        ):
+            with self.subTest(method=method), mock.patch(
+                'api.async_views.run_in_db_thread',
+                side_effect=lambda *args, **kwargs: HttpResponse(),
+            ) as run_in_db_thread:
+                async_to_sync(view)(getattr(factory, method)('/'))
+                self.assertEqual(run_in_db_thread.called, in_db_thread)
+
+    @async_to_sync
+    async def collect(self, chunks):
+        return [chunk async for chunk in chunks]
+
+    def test_stream_in_db_threads(self):
+        chunks = self.collect(
+            iter_in_db_thread(self.iter_lines(), contextvars.copy_context())
+        )
+        self.assertEqual(len(chunks), 3)
+        self.assertNotIn(threading.get_ident(), self.threads)
+        self.assertEqual(b''.join(chunks), b''.join(self.iter_lines()))
+
+    def test_handler_sends_chunks(self):
+        response = StreamingHttpResponse(())
+        response.async_streaming_content = iter_in_db_thread(
+            self.iter_lines(), contextvars.copy_context()
+        )
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(StreamingASGIHandler().send_response)(response, send)
+        bodies = [
+            message for message in messages
+            if message['type'] == 'http.response.body'
+        ]
+        self.assertEqual(len(bodies), 4)
+        self.assertEqual(bodies[-1], {'type': 'http.response.body'})
+        self.assertEqual(
+            b''.join(message['body'] for message in bodies[:-1]),
+            b''.join(self.iter_lines()),
+        )
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.authentication import get_token_cache_key, token_cache
+
+from .utils import create_user, get_client
+
+ME = '/api/users/me/'
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('user')
+        self.client = get_client(self.user)
+        self.cache_key = get_token_cache_key(self.user.auth_token.key)
+        self.assertEqual(self.client.get(ME).status_code, 200)
+        self.assertIsNotNone(cache.get(self.cache_key))
+        self.assertIsNotNone(token_cache.get(self.cache_key))
+
+    def assertTokenRejected(self):
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertIsNone(token_cache.get(self.cache_key))
+        self.assertEqual(self.client.get(ME).status_code, 401)
+
+    def test_logout(self):
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertTokenRejected()
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertTokenRejected()
+
+    def test_password_not_cached(self):
+        values, _ = cache.get(self.cache_key)
+        self.assertNotIn(self.user.password, values)
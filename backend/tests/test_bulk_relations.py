@@ -0,0 +1,117 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.views import (ERROR_ADD_TO_CART, ERROR_AUTHOR_NOT_FOUND,
+                       ERROR_DELETE_FROM_FAVORITE, ERROR_RECIPE_NOT_FOUND,
+                       ERROR_SUBSCRIBE, ERROR_SUBSCRIBE_SELF)
+from recipes.models import (AmountRecipe, CartIngredient, Favorite,
+                            Ingredient, Purchase)
+from users.models import Subscription
+
+from .utils import create_recipe, create_user, get_client
+
+MISSING = 10 ** 6
+
+
+class BulkRelationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.author = map(create_user, ('user', 'author'))
+        self.client = get_client(self.user)
+        self.recipes = [create_recipe(self.author) for _ in range(2)]
+        ingredient = Ingredient.objects.create(
+            name='ингредиент', measurement_unit='г'
+        )
+        for amount, recipe in enumerate(self.recipes, start=1):
+            AmountRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+
+    def send(self, method, path, **data):
+        response = getattr(self.client, method)(path, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (item['id'], item['status'], item.get('errors'))
+            for item in response.data['results']
+        ]
+
+    def test_favorite(self):
+        first, second = (recipe.pk for recipe in self.recipes)
+        self.assertEqual(
+            self.send(
+                'post',
+                '/api/recipes/favorite/',
+                recipes=[first, MISSING, first],
+            ),
+            [(first, 201, None), (MISSING, 404, ERROR_RECIPE_NOT_FOUND)],
+        )
+        self.assertEqual(
+            self.send(
+                'delete',
+                '/api/recipes/favorite/',
+                recipes=[first, second, MISSING],
+            ),
+            [
+                (first, 204, None),
+                (second, 400, ERROR_DELETE_FROM_FAVORITE),
+                (MISSING, 404, ERROR_RECIPE_NOT_FOUND),
+            ],
+        )
+        self.assertFalse(Favorite.objects.exists())
+        self.recipes[0].refresh_from_db(fields=['favorites_count'])
+        self.assertEqual(self.recipes[0].favorites_count, 0)
+
+    def test_shopping_cart(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        self.assertEqual(
+            self.send('post', '/api/recipes/shopping_cart/', recipes=ids),
+            [(pk, 201, None) for pk in ids],
+        )
+        self.assertEqual(
+            self.send('post', '/api/recipes/shopping_cart/', recipes=ids[:1]),
+            [(ids[0], 400, ERROR_ADD_TO_CART)],
+        )
+        self.assertEqual(Purchase.objects.count(), 2)
+        self.assertEqual(
+            list(CartIngredient.objects.values_list('amount', flat=True)),
+            [3],
+        )
+        self.send('delete', '/api/recipes/shopping_cart/', recipes=ids[:1])
+        self.assertEqual(
+            list(CartIngredient.objects.values_list('amount', flat=True)),
+            [2],
+        )
+
+    def test_subscribe(self):
+        authors = [self.author.pk, self.user.pk, MISSING]
+        self.assertEqual(
+            self.send('post', '/api/users/subscribe/', authors=authors),
+            [
+                (self.author.pk, 201, None),
+                (self.user.pk, 400, ERROR_SUBSCRIBE_SELF),
+                (MISSING, 404, ERROR_AUTHOR_NOT_FOUND),
+            ],
+        )
+        self.assertEqual(
+            self.send(
+                'post', '/api/users/subscribe/', authors=[self.author.pk]
+            ),
+            [(self.author.pk, 400, ERROR_SUBSCRIBE)],
+        )
+        self.assertTrue(
+            Subscription.objects.filter(
+                subscriber=self.user, author=self.author
+            ).exists()
+        )
+        self.author.refresh_from_db(fields=['followers_count'])
+        self.assertEqual(self.author.followers_count, 1)
+
+    def test_invalid_ids(self):
+        for recipes in ([], ['суп'], list(range(1, 102))):
+            with self.subTest(recipes=recipes[:3]):
+                response = self.client.post(
+                    '/api/recipes/favorite/',
+                    {'recipes': recipes},
+                    format='json',
+                )
+                self.assertEqual(response.status_code, 400)
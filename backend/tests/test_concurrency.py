@@ -0,0 +1,165 @@
+import threading
+import unittest
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TransactionTestCase
+
+from api.utils import change_shopping_cart
+from recipes.models import (AmountRecipe, CartIngredient, Favorite,
+                            Ingredient, Purchase)
+from users.models import Subscription
+
+from .utils import create_recipe, create_user, get_client
+
+THREADS = 8
+ROUNDS = 3
+CART_CHANGES = 300
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'SQLite блокирует таблицы при параллельной записи из потоков.',
+)
+class RelationConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.author = map(create_user, ('user', 'author'))
+        self.client = get_client(self.user)
+        self.recipe = create_recipe(self.author)
+        for number in range(3):
+            AmountRecipe.objects.create(
+                recipe=self.recipe,
+                ingredient=Ingredient.objects.create(
+                    name=f'ингредиент {number}', measurement_unit='г'
+                ),
+                amount=number + 1,
+            )
+
+    def hammer(self, method, path):
+        barrier = threading.Barrier(THREADS)
+        statuses = []
+
+        def run():
+            try:
+                client = get_client(self.user, raise_request_exception=False)
+                barrier.wait()
+                statuses.append(client.generic(method, path).status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=run) for _ in range(THREADS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return Counter(statuses)
+
+    def assertRaceFree(self, path):
+        for _ in range(ROUNDS):
+            for method, done_status in (('POST', 201), ('DELETE', 204)):
+                with self.subTest(path=path, method=method):
+                    statuses = self.hammer(method, path)
+                    self.assertEqual(statuses[done_status], 1, statuses)
+                    self.assertLessEqual(
+                        set(statuses), {done_status, 400}, statuses
+                    )
+        self.assertCounters()
+
+    def assertCounters(self):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            self.recipe.favorites_count,
+            Favorite.objects.filter(recipes=self.recipe).count(),
+        )
+        self.assertEqual(
+            self.recipe.in_carts_count,
+            Purchase.objects.filter(recipes=self.recipe).count(),
+        )
+        self.assertEqual(
+            self.author.followers_count,
+            Subscription.objects.filter(author=self.author).count(),
+        )
+        self.assertEqual(
+            dict(
+                AmountRecipe.objects.filter(
+                    recipe__purchases__user=self.user
+                )
+                .order_by()
+                .values_list('ingredient')
+                .annotate(amount=Sum('amount'))
+            ),
+            dict(
+                CartIngredient.objects.filter(user=self.user).values_list(
+                    'ingredient', 'amount'
+                )
+            ),
+        )
+
+    def test_favorite(self):
+        self.assertRaceFree(f'/api/recipes/{self.recipe.pk}/favorite/')
+
+    def test_shopping_cart(self):
+        self.assertRaceFree(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+
+    def test_subscribe(self):
+        self.assertRaceFree(f'/api/users/{self.author.pk}/subscribe/')
+
+    def test_bulk_create_missing_target(self):
+        response = self.client.post(
+            '/api/recipes/favorite/',
+            {'recipes': [self.recipe.pk, self.recipe.pk + 1]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            [201, 404],
+        )
+        self.assertCounters()
+
+    def test_cart_increments_survive_deletes(self):
+        ingredient = Ingredient.objects.first()
+        errors = []
+
+        def change(delta):
+            with transaction.atomic():
+                change_shopping_cart([self.user.pk], {ingredient.pk: delta})
+
+        def add_and_remove():
+            try:
+                for _ in range(CART_CHANGES):
+                    change(1)
+                    change(-1)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        def add():
+            try:
+                for _ in range(CART_CHANGES):
+                    change(1)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=add)] + [
+            threading.Thread(target=add_and_remove)
+            for _ in range(THREADS - 1)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            CartIngredient.objects.get(
+                user=self.user, ingredient=ingredient
+            ).amount,
+            CART_CHANGES,
+        )
@@ -0,0 +1,128 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recipes.models import Favorite, Ingredient, Purchase, Recipe, Tag
+from users.models import Subscription, User
+
+from .utils import create_recipe, create_user, get_client
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CountersTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user, self.author, self.other_author = map(
+            create_user, ('user', 'author', 'other_author')
+        )
+        self.recipe = create_recipe(self.author)
+        self.client = get_client(self.user)
+
+    def assertCounters(self, **counters):
+        for instance, field in (
+            (self.recipe, 'favorites_count'),
+            (self.recipe, 'in_carts_count'),
+            (self.author, 'followers_count'),
+            (self.author, 'recipes_count'),
+            (self.other_author, 'followers_count'),
+        ):
+            instance.refresh_from_db(fields=[field])
+        self.assertEqual(
+            {
+                'favorites': self.recipe.favorites_count,
+                'carts': self.recipe.in_carts_count,
+                'followers': self.author.followers_count,
+                'recipes': self.author.recipes_count,
+                'other_followers': self.other_author.followers_count,
+            },
+            counters,
+        )
+
+    def test_orm_relations(self):
+        self.assertCounters(
+            favorites=0, carts=0, followers=0, recipes=1, other_followers=0
+        )
+        Favorite.objects.create(user=self.user, recipes=self.recipe)
+        Purchase.objects.create(user=self.user, recipes=self.recipe)
+        subscription = Subscription.objects.create(
+            subscriber=self.user, author=self.author
+        )
+        self.assertCounters(
+            favorites=1, carts=1, followers=1, recipes=1, other_followers=0
+        )
+        subscription.author = self.other_author
+        subscription.save()
+        self.assertCounters(
+            favorites=1, carts=1, followers=0, recipes=1, other_followers=1
+        )
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        Purchase.objects.all().delete()
+        self.assertCounters(
+            favorites=0, carts=0, followers=0, recipes=1, other_followers=1
+        )
+
+    def test_drifted_counter_stays_non_negative(self):
+        Favorite.objects.bulk_create(
+            [Favorite(user=self.user, recipes=self.recipe)]
+        )
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertCounters(
+            favorites=0, carts=0, followers=0, recipes=1, other_followers=0
+        )
+
+    def test_stale_save_keeps_counters(self):
+        stale_recipe = Recipe.objects.get(pk=self.recipe.pk)
+        stale_author = User.objects.get(pk=self.author.pk)
+        self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        stale_recipe.name = 'Другое название'
+        stale_recipe.save()
+        stale_author.first_name = 'Другое'
+        stale_author.save()
+        self.assertCounters(
+            favorites=1, carts=0, followers=1, recipes=1, other_followers=0
+        )
+
+    def test_recipe_api(self):
+        client = get_client(self.author)
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        ingredient = Ingredient.objects.create(
+            name='ингредиент', measurement_unit='г'
+        )
+        response = client.post(
+            '/api/recipes/',
+            {
+                'ingredients': [{'id': ingredient.pk, 'amount': 10}],
+                'tags': [tag.pk],
+                'image': (
+                    'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///'
+                    'yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+                ),
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertCounters(
+            favorites=0, carts=0, followers=0, recipes=2, other_followers=0
+        )
+        response = client.delete(f'/api/recipes/{response.data["id"]}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCounters(
+            favorites=0, carts=0, followers=0, recipes=1, other_followers=0
+        )
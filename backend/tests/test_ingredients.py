@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.autocomplete import IngredientIndex
+from recipes.models import Ingredient
+
+INGREDIENTS = '/api/ingredients/'
+
+
+class IngredientAutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.views.ingredient_index', IngredientIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'морская соль',
+                'Соль крупная',
+                'сахар',
+                'соль',
+                'фасоль',
+            )
+        )
+
+    def get_names(self, name):
+        response = APIClient().get(INGREDIENTS, {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_before_substring(self):
+        self.assertEqual(
+            self.get_names('Соль'),
+            ['соль', 'Соль крупная', 'морская соль', 'фасоль'],
+        )
+        self.assertEqual(self.get_names('перец'), [])
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=3)
+    def test_limit(self):
+        self.assertEqual(
+            self.get_names('соль'), ['соль', 'Соль крупная', 'морская соль']
+        )
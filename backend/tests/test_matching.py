@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.matching import RecipeMatchIndex
+from recipes.models import AmountRecipe, Ingredient
+
+from .utils import create_recipe, create_user
+
+MATCH = '/api/recipes/match/'
+
+
+class RecipeMatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch(
+            'api.views.recipe_match_index', RecipeMatchIndex()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        author = create_user('author')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.full = self.create_recipe(author, 0, 1)
+            self.partial = self.create_recipe(author, 0, 1, 2, 3)
+
+    def create_recipe(self, author, *numbers):
+        recipe = create_recipe(author)
+        for number in numbers:
+            AmountRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredients[number], amount=1
+            )
+        return recipe
+
+    def get_matches(self, *numbers, **params):
+        params['ingredients'] = [
+            self.ingredients[number].pk for number in numbers
+        ]
+        response = self.client.get(MATCH, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (recipe['id'], recipe['coverage'], recipe['matched_ingredients'])
+            for recipe in response.data
+        ]
+
+    def test_coverage(self):
+        self.assertEqual(
+            self.get_matches(0, 1),
+            [(self.full.pk, 1.0, 2), (self.partial.pk, 0.5, 2)],
+        )
+        self.assertEqual(
+            self.get_matches(1, 2, 3),
+            [(self.partial.pk, 0.75, 3), (self.full.pk, 0.5, 1)],
+        )
+        self.assertEqual(
+            self.get_matches(1, 2, 3, limit=1), [(self.partial.pk, 0.75, 3)]
+        )
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.get_matches(2), [(self.partial.pk, 0.25, 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            AmountRecipe.objects.create(
+                recipe=self.full, ingredient=self.ingredients[2], amount=1
+            )
+        self.assertEqual(
+            self.get_matches(2),
+            [(self.full.pk, 0.3333, 1), (self.partial.pk, 0.25, 1)],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.partial.delete()
+        self.assertEqual(self.get_matches(2), [(self.full.pk, 0.3333, 1)])
+
+    def test_invalid_request(self):
+        ingredient = self.ingredients[0].pk
+        for query in (
+            '',
+            'ingredients=суп',
+            f'ingredients={ingredient}&limit=0',
+            f'ingredients={ingredient}&limit=много',
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(f'{MATCH}?{query}')
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+from .utils import create_recipe, create_user
+
+
+class PaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.by_name, self.by_text = (
+            create_recipe(self.author, name=name, text=text)
+            for name, text in (
+                ('суп', 'описание'),
+                ('рецепт', 'суп на обед'),
+            )
+        )
+        Recipe.objects.all().update_search_vector()
+
+    def get_page(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_ids(self, url):
+        return [recipe['id'] for recipe in self.get_page(url)['results']]
+
+    def test_offset_pages(self):
+        for query, count in (('', 2), ('&count=false', None)):
+            with self.subTest(query=query):
+                page = self.get_page(f'/api/recipes/?limit=1{query}')
+                self.assertEqual(page['count'], count)
+                self.assertIsNone(page['previous'])
+                self.assertEqual(
+                    [recipe['id'] for recipe in page['results']],
+                    [self.by_text.pk],
+                )
+                page = self.get_page(page['next'])
+                self.assertEqual(
+                    [recipe['id'] for recipe in page['results']],
+                    [self.by_name.pk],
+                )
+                self.assertIsNone(page['next'])
+                self.assertIsNotNone(page['previous'])
+
+    def test_cursor_pages(self):
+        page = self.get_page('/api/recipes/?cursor=&limit=1')
+        self.assertIsNone(page['count'])
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']], [self.by_text.pk]
+        )
+        self.assertIn(f'cursor={self.by_text.pk}', page['next'])
+        page = self.get_page(page['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']], [self.by_name.pk]
+        )
+        self.assertIsNone(page['next'])
+        self.assertIsNone(page['previous'])
+        self.assertEqual(
+            self.get_page('/api/recipes/?cursor=&count=true')['count'], 2
+        )
+
+    def test_invalid_page(self):
+        for query in ('cursor=суп', 'page=0', 'page=суп', 'page=5'):
+            with self.subTest(query=query):
+                response = APIClient().get(f'/api/recipes/?{query}')
+                self.assertEqual(response.status_code, 404)
+
+    def test_search_ranking_kept_without_count(self):
+        expected = [self.by_name.pk, self.by_text.pk]
+        for query in ('', '&count=false', '&count=false&page=1'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.get_ids(f'/api/recipes/?search=суп{query}'),
+                    expected,
+                )
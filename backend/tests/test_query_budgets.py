@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.feed import enable_feed_inbox
+from recipes.generators import generate_dataset
+from users.models import User
+
+from .utils import get_client
+
+MEDIA_ROOT = tempfile.mkdtemp()
+MAX_MS = 500
+
+RECIPES = '/api/recipes/?page=1&limit=6'
+RECIPES_BY_CURSOR = '/api/recipes/?cursor=&limit=6'
+RECIPE = '/api/recipes/{}/'
+INGREDIENTS_SEARCH = '/api/ingredients/?name=ингр'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_ids, cls.recipe_ids = generate_dataset(
+            users=30, recipes=200, seed=0
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+        call_command('rebuild_shopping_carts', stdout=StringIO())
+        enable_feed_inbox(cls.user_ids[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authenticated = get_client(User(pk=self.user_ids[0]))
+        self.recipe = RECIPE.format(self.recipe_ids[-1])
+
+    def assertBudget(self, client, url, max_queries, max_ms=MAX_MS):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            duration = (time.perf_counter() - started) * 1000
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLessEqual(
+            len(queries),
+            max_queries,
+            '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+        self.assertLessEqual(duration, max_ms, url)
+        return response
+
+    def test_anonymous_recipes(self):
+        for url, max_queries in (
+            (RECIPES, 4),
+            (RECIPES_BY_CURSOR, 3),
+            (self.recipe, 3),
+        ):
+            with self.subTest(url=url):
+                response = self.assertBudget(self.anonymous, url, max_queries)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                response = self.assertBudget(self.anonymous, url, 0)
+                self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_reference_data(self):
+        for url in ('/api/tags/', '/api/ingredients/', INGREDIENTS_SEARCH):
+            with self.subTest(url=url):
+                response = self.assertBudget(self.anonymous, url, 1)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                response = self.assertBudget(self.anonymous, url, 0)
+                self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_first_authenticated_request(self):
+        self.assertBudget(self.authenticated, RECIPES, 8)
+        self.assertBudget(self.authenticated, RECIPES, 4)
+
+    def test_authenticated_endpoints(self):
+        self.assertBudget(self.authenticated, '/api/users/me/', 5)
+        for url, max_queries in (
+            (RECIPES, 4),
+            ('/api/recipes/?page=1&limit=6&tags=breakfast&tags=lunch', 5),
+            (RECIPES_BY_CURSOR, 3),
+            ('/api/recipes/?is_favorited=1', 4),
+            ('/api/recipes/?is_in_shopping_cart=1', 4),
+            (self.recipe, 3),
+            ('/api/users/subscriptions/?page=1&limit=6&recipes_limit=3', 3),
+            ('/api/feed/', 3),
+            (INGREDIENTS_SEARCH, 1),
+        ):
+            with self.subTest(url=url):
+                self.assertBudget(self.authenticated, url, max_queries)
+
+    def test_feed_inbox(self):
+        client = get_client(User(pk=self.user_ids[1]))
+        self.assertBudget(client, '/api/users/me/', 5)
+        self.assertBudget(client, '/api/feed/', 4)
+
+    def test_shopping_cart_download(self):
+        self.assertBudget(self.authenticated, '/api/users/me/', 5)
+        for file_format in ('txt', 'csv'):
+            with self.subTest(file_format=file_format):
+                response = self.assertBudget(
+                    self.authenticated,
+                    '/api/recipes/download_shopping_cart/'
+                    f'?file_format={file_format}',
+                    1,
+                )
+                self.assertTrue(response.streaming)
@@ -0,0 +1,64 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.images import RENDITIONS, generate_renditions, rendition_name
+
+from .utils import create_recipe, create_user
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RenditionCleanupTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = create_user('author')
+
+    def save_image(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), '#E26C2D').save(buffer, 'PNG')
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def create_rendered_recipe(self, image):
+        recipe = create_recipe(self.author, image=image)
+        generate_renditions(recipe.pk, image)
+        return recipe
+
+    def assertRenditions(self, image, exist):
+        for rendition in RENDITIONS:
+            self.assertEqual(
+                default_storage.exists(rendition_name(image, rendition)),
+                exist,
+            )
+
+    def test_replaced_image(self):
+        old_image = self.save_image('media/old.png')
+        recipe = self.create_rendered_recipe(old_image)
+        self.assertRenditions(old_image, True)
+        recipe.image = self.save_image('media/new.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save(update_fields=['image'])
+        self.assertRenditions(old_image, False)
+        self.assertFalse(generate_renditions(recipe.pk, old_image))
+        self.assertRenditions(old_image, False)
+
+    def test_deleted_recipe(self):
+        shared_image = self.save_image('media/shared.png')
+        recipe = self.create_rendered_recipe(shared_image)
+        other_recipe = self.create_rendered_recipe(shared_image)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertRenditions(shared_image, True)
+        with self.captureOnCommitCallbacks(execute=True):
+            other_recipe.delete()
+        self.assertRenditions(shared_image, False)
@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cache import invalidate_reference_cache
+from api.views import RecipesViewSet
+from foodgram.db_router import read_database
+from recipes.models import Tag
+
+from .utils import create_recipe, create_user
+
+
+class AnonymousResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.reader = map(create_user, ('author', 'reader'))
+        self.recipe = create_recipe(self.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def assertInvalidated(self, invalidated, save):
+        with mock.patch('api.signals.invalidate_on_commit') as invalidate:
+            save()
+        self.assertEqual(invalidate.called, invalidated)
+
+    def test_lock_released_after_error(self):
+        client = APIClient(raise_request_exception=False)
+        self.assertEqual(client.get(self.url)['X-Cache'], 'MISS')
+        invalidate_reference_cache('recipes')
+        with mock.patch.object(
+            RecipesViewSet, 'get_object', side_effect=RuntimeError
+        ):
+            self.assertEqual(client.get(self.url).status_code, 500)
+        self.assertEqual(client.get(self.url)['X-Cache'], 'MISS')
+
+    def test_foreign_lock_kept(self):
+        client = APIClient()
+        with mock.patch('api.cache.cache', wraps=cache) as locks:
+            self.assertEqual(client.get(self.url)['X-Cache'], 'MISS')
+            invalidate_reference_cache('recipes')
+            with self.settings(RESPONSE_CACHE_STALE=False):
+                self.assertEqual(client.get(self.url)['X-Cache'], 'MISS')
+        locks.delete.assert_not_called()
+
+    def test_refill_reads_from_primary(self):
+        databases = []
+
+        def get_object(view):
+            databases.append(read_database.get())
+            raise Http404
+
+        token = read_database.set('replica')
+        try:
+            with mock.patch.object(
+                RecipesViewSet, 'get_object', autospec=True,
+                side_effect=get_object,
+            ):
+                APIClient().get(self.url)
+        finally:
+            read_database.reset(token)
+        self.assertEqual(databases, [DEFAULT_DB_ALIAS])
+
+    def test_author_changes(self):
+        self.author.first_name = 'Другое'
+        self.assertInvalidated(True, self.author.save)
+        self.assertInvalidated(
+            False, lambda: self.author.save(update_fields=['last_login'])
+        )
+        self.author.set_password('other')
+        self.assertInvalidated(False, self.author.save)
+
+    def test_reader_changes(self):
+        self.reader.first_name = 'Другое'
+        self.assertInvalidated(False, self.reader.save)
+
+
+class ReferenceCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+
+    def test_conditional_requests(self):
+        client = APIClient()
+        etag = client.get('/api/tags/')['ETag']
+        for url, status in (
+            ('/api/tags/', 304),
+            (f'/api/tags/{self.tag.pk}/', 304),
+            (f'/api/tags/{self.tag.pk + 1}/', 404),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status)
@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import AmountRecipe, Ingredient, Recipe
+
+from .utils import create_recipe, create_user
+
+
+class RecipeSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = create_user('author')
+        self.by_name = create_recipe(author, name='томат')
+        self.by_ingredient = create_recipe(author)
+        AmountRecipe.objects.create(
+            recipe=self.by_ingredient,
+            ingredient=Ingredient.objects.create(
+                name='томат', measurement_unit='г'
+            ),
+            amount=1,
+        )
+        self.by_text = create_recipe(author, text='томат')
+        create_recipe(author)
+        Recipe.objects.all().update_search_vector()
+
+    def get_ids(self, search):
+        response = APIClient().get('/api/recipes/', {'search': search})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_ranking(self):
+        self.assertEqual(
+            self.get_ids('томат'),
+            [self.by_name.pk, self.by_ingredient.pk, self.by_text.pk],
+        )
+        self.assertEqual(self.get_ids('огурец'), [])
@@ -0,0 +1,152 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+
+from api.utils import iter_shopping_cart
+from recipes.models import (AmountRecipe, CartIngredient, Ingredient,
+                            Purchase, RecipeTag, Tag)
+
+from .utils import create_recipe, create_user, get_client
+
+
+class ShoppingCartAggregateTest(TestCase):
+    def setUp(self):
+        self.users = [create_user(f'user{number}') for number in range(2)]
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        self.recipes = []
+        for number in range(2):
+            recipe = create_recipe(self.users[0], name=f'Рецепт {number}')
+            RecipeTag.objects.create(recipe=recipe, tag=self.tag)
+            for ingredient in self.ingredients[:3]:
+                AmountRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=10
+                )
+            self.recipes.append(recipe)
+        for user in self.users:
+            for recipe in self.recipes:
+                Purchase.objects.create(user=user, recipes=recipe)
+
+    def assertCartsInSync(self):
+        expected = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                AmountRecipe.objects.filter(recipe__purchases__isnull=False)
+                .order_by()
+                .values_list('recipe__purchases__user', 'ingredient')
+                .annotate(amount=Sum('amount'))
+            )
+        }
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                CartIngredient.objects.values_list(
+                    'user', 'ingredient', 'amount'
+                )
+            )
+        }
+        self.assertEqual(actual, expected)
+
+    def test_purchases(self):
+        self.assertCartsInSync()
+        Purchase.objects.filter(user=self.users[0]).first().delete()
+        self.assertCartsInSync()
+        purchase = Purchase.objects.filter(user=self.users[1]).first()
+        purchase.user = self.users[0]
+        purchase.save()
+        self.assertCartsInSync()
+
+    def test_amounts(self):
+        amount = AmountRecipe.objects.filter(recipe=self.recipes[0]).first()
+        amount.amount = 25
+        amount.save()
+        self.assertCartsInSync()
+        amount.ingredient = self.ingredients[3]
+        amount.save()
+        self.assertCartsInSync()
+        amount.delete()
+        self.assertCartsInSync()
+        AmountRecipe.objects.create(
+            recipe=self.recipes[1], ingredient=self.ingredients[3], amount=5
+        )
+        self.assertCartsInSync()
+
+    def test_cascades(self):
+        self.recipes[0].delete()
+        self.assertCartsInSync()
+        self.ingredients[0].delete()
+        self.assertCartsInSync()
+
+    def test_recipe_update(self):
+        response = get_client(self.users[0]).patch(
+            f'/api/recipes/{self.recipes[0].pk}/',
+            {
+                'ingredients': [
+                    {'id': self.ingredients[0].pk, 'amount': 10},
+                    {'id': self.ingredients[1].pk, 'amount': 30},
+                    {'id': self.ingredients[3].pk, 'amount': 7},
+                ],
+                'tags': [self.tag.pk],
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertCartsInSync()
+
+    def test_download_in_batches(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name='ингредиент 1', measurement_unit=unit)
+            for unit in ('кг', 'шт')
+        )
+        AmountRecipe.objects.bulk_create(
+            AmountRecipe(
+                recipe=self.recipes[1], ingredient=ingredient, amount=3
+            )
+            for ingredient in Ingredient.objects.filter(
+                name='ингредиент 1'
+            ).exclude(measurement_unit='г')
+        )
+        call_command('rebuild_shopping_carts', stdout=StringIO())
+        rows = list(iter_shopping_cart(self.users[0]))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(
+            [(name, unit) for name, _, unit in rows],
+            sorted((name, unit) for name, _, unit in rows),
+        )
+        with mock.patch('api.utils.SHOPPING_CART_CHUNK_SIZE', 2):
+            self.assertEqual(list(iter_shopping_cart(self.users[0])), rows)
+
+    def test_rebuild(self):
+        carts = CartIngredient.objects.filter(user=self.users[0])
+        carts.filter(ingredient=self.ingredients[0]).update(amount=1)
+        carts.filter(ingredient=self.ingredients[1]).delete()
+        CartIngredient.objects.create(
+            user=self.users[0], ingredient=self.ingredients[3], amount=5
+        )
+        drifted = set(CartIngredient.objects.values_list('pk', 'amount'))
+        stdout = StringIO()
+        call_command('rebuild_shopping_carts', '--dry-run', stdout=stdout)
+        self.assertIn('Строк: 6, расхождений 3', stdout.getvalue())
+        self.assertEqual(
+            set(CartIngredient.objects.values_list('pk', 'amount')), drifted
+        )
+        stdout = StringIO()
+        call_command('rebuild_shopping_carts', stdout=stdout)
+        self.assertIn('Строк: 6, расхождений 3', stdout.getvalue())
+        self.assertCartsInSync()
+        stdout = StringIO()
+        call_command('rebuild_shopping_carts', '--dry-run', stdout=stdout)
+        self.assertIn('Строк: 6, расхождений 0', stdout.getvalue())
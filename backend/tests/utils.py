@@ -0,0 +1,32 @@
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+RECIPE_IMAGE = 'media/generated.png'
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        username=username,
+        first_name='Имя',
+        last_name='Фамилия',
+        password='password',
+    )
+
+
+def create_recipe(author, **fields):
+    fields.setdefault('name', 'Рецепт')
+    fields.setdefault('image', RECIPE_IMAGE)
+    fields.setdefault('text', 'Описание')
+    fields.setdefault('cooking_time', 10)
+    return Recipe.objects.create(author=author, **fields)
+
+
+def get_client(user, **kwargs):
+    client = APIClient(**kwargs)
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
@@ -11,6 +11,8 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'is_superuser',
+        'followers_count',
+        'recipes_count',
     )
     search_fields = ('username',)
     list_filter = ('email', 'username')
@@ -3,6 +3,8 @@ from django.db import models
 
 from .managers import UserManager
 
+COUNTER_FIELDS = ('followers_count', 'recipes_count')
+
 
 class User(AbstractUser, PermissionsMixin):
 
@@ -16,6 +18,15 @@ class User(AbstractUser, PermissionsMixin):
 
     last_name = models.CharField('Фамилия', max_length=150)
     is_superuser = models.BooleanField('Администратор', default=False)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+    feed_inbox = models.BooleanField(
+        'Лента собирается при публикации', default=False, editable=False
+    )
 
     objects = UserManager()
 
@@ -34,6 +45,31 @@ class User(AbstractUser, PermissionsMixin):
     def is_staff(self):
         return self.is_superuser
 
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        # Счётчики меняются только через F(): при сохранении объекта целиком
+        # (админка, shell) не записываем прочитанные раньше значения.
+        if update_fields is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Пользователь из кэша авторизации приходит с отложенными полями:
+        # подгружаем их одним запросом, кроме счётчиков, которые меняются
+        # через F() и не должны затираться при сохранении.
+        if fields is not None:
+            deferred = self.get_deferred_fields() - set(COUNTER_FIELDS)
+            if deferred.intersection(fields):
+                fields = deferred.union(fields)
+        super().refresh_from_db(using, fields)
+
     def get_full_name(self):
         return self.first_name, self.last_name
 